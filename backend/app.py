@@ -1,13 +1,27 @@
-from fastapi import FastAPI, HTTPException, Body
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-from utils.model_generations import generate_llm_response
+from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ConfigDict, ValidationError
+from typing import List, Dict, Optional, Tuple
+from utils.model_generations import generate_llm_response, generate_llm_responses, generate_structured_llm_response, stream_llm_response, close_llm_client
 from utils.constants import FOCUS_AREAS, CAREER_RECOMMENDATIONS, PERSONALITY_QUESTIONS
-from prompts.prompt_templates import get_focus_recommendation_prompt, get_personality_inference_prompt, get_interests_prompt, get_job_description_prompt, get_soft_skills_prompt, get_detailed_personality_analysis_prompt
-from utils.helper_functions import parse_llm_list_response, parse_llm_reasoning_response
+from prompts.prompt_templates import get_focus_recommendation_prompt, get_personality_inference_prompt, get_interests_prompt, get_job_description_prompt, get_soft_skills_prompt, get_detailed_personality_analysis_prompt, get_combined_assessment_prompt
+from utils.helper_functions import FocusRecommendationParser, parse_focus_recommendations, format_sse
+from utils.profile_store import create_profile_store, ProfileStoreBusyError, VersionConflictError
+from utils.chatbot_session import ChatbotSession, Step, sweep_idle_sessions, CHATBOT_SESSION_SWEEP_INTERVAL
+from utils.job_queue import create_job_queue, job_view, JobQueueFullError, QUEUED, RUNNING, SUCCEEDED
+from utils.focus_ranking import candidate_focus_areas, local_focus_recommendations, rank_careers
+from utils.resilience import LLMError
+from utils.token_budget import load_encoding
+from utils.metrics import logger, log_sampled, render_metrics, LOG_LEVEL, HTTP_REQUEST_DURATION, CHATBOT_STEP_DURATION
+import asyncio
+import hashlib
 import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 # --- Data Models ---
 class LearnerProfile(BaseModel):
@@ -20,9 +34,10 @@ class LearnerProfile(BaseModel):
     values: Optional[str] = None
     career_goals: Optional[str] = None
     personality_traits: Optional[str] = None
-    chatbot_state: Optional[dict] = None
+    chatbot_state: Optional[dict] = None  # A serialized ChatbotSession while the assessment is in progress
     location: Optional[str] = None # Add location to the profile
     location_asked: bool = False # Flag to track if we've asked for location
+    focus_recommendations: Optional[List[Dict[str, str]]] = None # Ranked focus areas from a structured assessment
 
 class ChatbotInteractionRequest(BaseModel):
     user_id: str
@@ -32,6 +47,7 @@ class ChatbotResponse(BaseModel):
     user_id: str
     response: str
     is_assessment_complete: bool = False
+    job_id: Optional[str] = None  # Set when the assessment analysis continues as a background job
 
 class FocusRecommendationResponse(BaseModel):
     recommended_focus_areas: List[str]
@@ -41,81 +57,248 @@ class CareerRecommendationResponse(BaseModel):
     recommended_careers: List[Dict[str, str]]
     soft_skills: str
 
-# --- In-Memory User Data ---
-USER_PROFILES_FILE = "user_profiles.json"
-
-# Load user profiles from file at startup
-try:
-    with open(USER_PROFILES_FILE, "r") as f:
-        user_profiles = json.load(f)
-        print("User profiles loaded from file:", user_profiles)  # Add this line
-        # Convert loaded data back to LearnerProfile objects
-        for user_id, profile_data in user_profiles.items():
-            user_profiles[user_id] = LearnerProfile(**profile_data)
-            print(f"Loaded profile for user {user_id}:", user_profiles[user_id])  # Add this line
-except FileNotFoundError:
-    user_profiles = {}  # Start with an empty dictionary if the file doesn't exist
-    print("User profiles file not found. Starting with an empty dictionary.")  # Add this line
-except json.JSONDecodeError:
-    user_profiles = {}  # Handle potential JSON decoding errors
-    print("Error decoding user profiles JSON. Starting with an empty dictionary.")  # Add this line
+class FocusAreaRecommendation(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    focus_area: str
+    reasoning: str
+
+class AssessmentAnalysis(BaseModel):
+    """Schema for the single structured completion used when STRUCTURED_ASSESSMENT is enabled."""
+    model_config = ConfigDict(extra="forbid")
+    personality_traits: str
+    interests: str
+    focus_areas: List[FocusAreaRecommendation]
+
+class FocusJobRequest(BaseModel):
+    user_id: str
+    priority: Optional[int] = None  # Lower runs sooner; defaults per job kind
+
+class CareerJobRequest(BaseModel):
+    user_id: str
+    chosen_focus_area: str
+    priority: Optional[int] = None
+
+class BatchAssessmentItem(BaseModel):
+    """One learner in a batch upload: their answers to PERSONALITY_QUESTIONS plus any known profile fields."""
+    user_id: str
+    answers: List[str]
+    age: Optional[int] = None
+    passion: Optional[str] = None
+    location: Optional[str] = None
+    educational_background: Optional[str] = None
+    professional_experience: Optional[str] = None
+    skills: Optional[str] = None
+    values: Optional[str] = None
+    career_goals: Optional[str] = None
+
+# --- User Data ---
+CAREER_FANOUT_CONCURRENCY = int(os.getenv("CAREER_FANOUT_CONCURRENCY", "8"))
+# When enabled, completing the assessment returns immediately and the analysis is filled in afterwards
+ASSESSMENT_ANALYSIS_IN_BACKGROUND = os.getenv("ASSESSMENT_ANALYSIS_IN_BACKGROUND", "false").lower() == "true"
+BACKGROUND_SAVE_ATTEMPTS = 3
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_MAX_USERS = int(os.getenv("BATCH_MAX_USERS", "10000"))
+BATCH_SAVE_CHUNK = int(os.getenv("BATCH_SAVE_CHUNK", "200"))  # Completed profiles written per transaction
+# When enabled, one JSON-schema completion returns personality, interests and ranked focus areas together
+STRUCTURED_ASSESSMENT = os.getenv("STRUCTURED_ASSESSMENT", "false").lower() == "true"
+# "llm" asks the model to choose among locally pre-ranked candidates; "local" skips the LLM entirely
+FOCUS_RANKING_MODE = os.getenv("FOCUS_RANKING_MODE", "llm")
+# Default job priorities: analysis a user is waiting on in the chat first, then focus, then careers
+JOB_PRIORITIES = {"assessment_analysis": 0, "focus_recommendations": 1, "career_recommendations": 2}
+JOB_PRIORITY_RANGE = 10  # A client may lower its job's priority by up to this much, never raise it above the kind's default
+
+background_tasks = set()
+
+profile_store = create_profile_store()
+job_queue = create_job_queue()
+
+# The store is synchronous (sqlite, file I/O), so it is called from a worker thread to keep the event loop free
+async def get_profile(user_id: str) -> Optional[LearnerProfile]:
+    """Returns the user's profile as currently stored."""
+    profile_data = await asyncio.to_thread(profile_store.load, user_id)
+    return LearnerProfile(**profile_data) if profile_data is not None else None
+
+async def load_profile_versioned(user_id: str) -> Tuple[Optional[LearnerProfile], int]:
+    """Returns the user's profile together with the store version it was read at."""
+    profile_data, version = await asyncio.to_thread(profile_store.load_versioned, user_id)
+    return (LearnerProfile(**profile_data) if profile_data is not None else None), version
+
+async def save_profile(user_id: str, profile: LearnerProfile, expected_version: Optional[int] = None) -> int:
+    """Upserts a single user's profile into the store, optionally only if unchanged since expected_version."""
+    return await asyncio.to_thread(profile_store.save, user_id, profile.dict(), expected_version)
+
+# --- Lifecycle ---
+async def sweep_sessions_periodically():
+    """Drops abandoned chatbot sessions so the store (and the JSON backend's in-memory copy) stays bounded."""
+    while True:
+        await asyncio.sleep(CHATBOT_SESSION_SWEEP_INTERVAL)
+        try:
+            # Every uvicorn worker runs this loop; the claim lets only one of them sweep per interval
+            if await asyncio.to_thread(profile_store.claim_periodic_task, "chatbot_session_sweep", CHATBOT_SESSION_SWEEP_INTERVAL / 2):
+                await asyncio.to_thread(sweep_idle_sessions, profile_store)
+        except Exception:
+            logger.exception("Chatbot session sweep failed.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(load_encoding)
+    if CHATBOT_SESSION_SWEEP_INTERVAL > 0:
+        task = asyncio.create_task(sweep_sessions_periodically())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    job_queue.start()
+    yield
+    for task in list(background_tasks):
+        task.cancel()
+    await job_queue.stop()
+    job_queue.close()
+    await close_llm_client()
+    profile_store.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Instrumentation ---
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template rather than raw path so user ids don't explode the series count
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=request.method,
+                                      route=getattr(route, "path", "unmatched"), status=status)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# --- Error Handling ---
+@app.exception_handler(LLMError)
+async def llm_error_handler(request, exc: LLMError):
+    """Upstream LLM failures become 429/502/503 responses instead of being stored as answers."""
+    headers = {"Retry-After": str(max(1, round(exc.retry_after)))} if exc.retry_after is not None else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": "The language model is temporarily unavailable. Please try again shortly."}, headers=headers)
+
+@app.exception_handler(ProfileStoreBusyError)
+async def profile_store_busy_handler(request, exc: ProfileStoreBusyError):
+    """A store locked by another writer for too long is reported as a retryable 503 rather than a hung request."""
+    return JSONResponse(status_code=503, content={"detail": "The profile store is busy. Please try again shortly."}, headers={"Retry-After": "1"})
 
 # --- Endpoints ---
 @app.get("/users/{user_id}")
-async def get_user_profile(user_id: str):
-    profile = user_profiles.get(user_id)
-    if profile:
-        return profile.dict()
-    else:
+async def get_user_profile(user_id: str, request: Request, fields: Optional[str] = None):
+    """Returns the profile, or only the comma-separated `fields`, with a strong ETag for conditional polling."""
+    # An empty projection ("?fields=" or "?fields=,") returns the whole profile rather than {}
+    include = {field.strip() for field in (fields or "").split(",") if field.strip()} or None
+    if include:
+        unknown = include - LearnerProfile.model_fields.keys()
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown profile fields: {', '.join(sorted(unknown))}")
+
+    profile = await get_profile(user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
 
+    body = profile.model_dump_json(include=include).encode()
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix on the client's copy still matches."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
 @app.post("/chatbot/interact", response_model=ChatbotResponse)
 async def chatbot_interact(request: ChatbotInteractionRequest):
     user_id = request.user_id
-    user_message = request.message
 
-    if user_id not in user_profiles:
-        user_profiles[user_id] = LearnerProfile(age=0, passion="")  # Provide default values
-        user_profiles[user_id].chatbot_state = {"step": "initial", "responses": []}
+    # Session state lives in the shared store so any worker can serve the next message.
+    # The write is conditional on the version we read, so two workers racing on the same
+    # user cannot both advance the state machine.
+    profile, version = await load_profile_versioned(user_id)
+    if profile is None:
+        profile = LearnerProfile(age=0, passion="")  # Provide default values
+        profile.chatbot_state = ChatbotSession().to_dict()
         # return {"user_id": user_id, "response": "Welcome to CareerCraft AI! Let's explore your potential career paths together.", "is_assessment_complete": False} # Welcome message
 
-    profile = user_profiles[user_id]
-    state = profile.chatbot_state
+    session = ChatbotSession.from_dict(profile.chatbot_state)
+    if session is not None and session.is_expired():
+        session = ChatbotSession()  # Abandoned long ago; start the questions over
+    defer_analysis = ASSESSMENT_ANALYSIS_IN_BACKGROUND and is_final_step(profile, session)
+    if defer_analysis:
+        conversation_history = session.conversation_history()
+        detailed = not profile.location
+
+    step = session.step.name.lower() if session else "complete"
+    with CHATBOT_STEP_DURATION.time(step=step):
+        response = await advance_chatbot(user_id, profile, session, request.message, defer_analysis=defer_analysis)
+    try:
+        await save_profile(user_id, profile, expected_version=version)
+    except VersionConflictError:
+        raise HTTPException(status_code=409, detail="Your profile was updated by another request. Please resend your message.")
+
+    if defer_analysis:
+        response["job_id"] = await schedule_background_analysis(user_id, conversation_history, detailed)
+    return response
+
+async def advance_chatbot(user_id: str, profile: LearnerProfile, session: Optional[ChatbotSession], user_message: str, defer_analysis: bool = False) -> dict:
+    """Runs one step of the assessment state machine, mutating the profile and session in place.
 
-    if state["step"] == "initial":
+    The session is written back into profile.chatbot_state, or cleared once the
+    assessment completes. With defer_analysis=True the final step completes the
+    assessment without waiting for the personality and interests analysis; the
+    caller schedules it.
+    """
+    if session is None:
+        # The original state machine assumed a session; treat a completed profile as starting over
+        session = ChatbotSession()
+    session.touch()
+    response = await advance_session(user_id, profile, session, user_message, defer_analysis)
+    profile.chatbot_state = None if response["is_assessment_complete"] else session.to_dict()
+    return response
+
+async def advance_session(user_id: str, profile: LearnerProfile, session: ChatbotSession, user_message: str, defer_analysis: bool) -> dict:
+    if session.step == Step.INITIAL:
         if profile.age == 0:
-            profile.chatbot_state["step"] = "ask_age"
+            session.step = Step.ASK_AGE
             return {"user_id": user_id, "response": "Hello! To get started, could you please tell me your age?", "is_assessment_complete": False}
         elif profile.passion == "":
-            profile.chatbot_state["step"] = "ask_passion"
+            session.step = Step.ASK_PASSION
             return {"user_id": user_id, "response": "That's great. What are you most passionate about?", "is_assessment_complete": False}
         else:
-            profile.chatbot_state["step"] = "personality_questions"
-            profile.chatbot_state["question_index"] = 0
+            session.step = Step.PERSONALITY_QUESTIONS
+            session.question_index = 0
             return {"user_id": user_id, "response": PERSONALITY_QUESTIONS[0], "is_assessment_complete": False}
 
-    elif state["step"] == "ask_age":
+    elif session.step == Step.ASK_AGE:
         try:
             profile.age = int(user_message)
-            profile.chatbot_state["step"] = "ask_passion"
+            session.step = Step.ASK_PASSION
             return {"user_id": user_id, "response": "Thank you. What are you most passionate about?", "is_assessment_complete": False}
         except ValueError:
             return {"user_id": user_id, "response": "Please enter a valid age (a number).", "is_assessment_complete": False}
 
-    elif state["step"] == "ask_passion":
+    elif session.step == Step.ASK_PASSION:
         profile.passion = user_message
-        profile.chatbot_state["step"] = "personality_questions"
-        profile.chatbot_state["question_index"] = 0
+        session.step = Step.PERSONALITY_QUESTIONS
+        session.question_index = 0
         return {"user_id": user_id, "response": PERSONALITY_QUESTIONS[0], "is_assessment_complete": False}
 
-    elif state["step"] == "personality_questions":
-        question_index = state.get("question_index", 0)
-        responses = state.get("responses", [])
+    else:
+        question_index = session.question_index
 
         if question_index < len(PERSONALITY_QUESTIONS):
-            responses.append(f"User: {user_message}")
-            state["responses"] = responses
-            state["question_index"] = question_index + 1  # Increment the question_index
+            session.record_answer(user_message)
             if question_index < len(PERSONALITY_QUESTIONS)-1:
                 next_question = PERSONALITY_QUESTIONS[question_index+1]
                 return {"user_id": user_id, "response": next_question, "is_assessment_complete": False}
@@ -127,80 +310,416 @@ async def chatbot_interact(request: ChatbotInteractionRequest):
             return {"user_id": user_id, "response": "Thank you for answering the personality questions. Could you please tell me where you are currently located? This will help me provide more relevant career information.", "is_assessment_complete": False}
         elif not profile.location:
             profile.location = user_message
-            # Save user profiles to file
-            with open(USER_PROFILES_FILE, "w") as f:
-                json.dump({k: v.dict() for k, v in user_profiles.items()}, f, indent=4)
-
-            conversation_history = "\n".join(profile.chatbot_state.get("responses", [])) # Get the responses
-            prompt = get_detailed_personality_analysis_prompt(conversation_history) # Analyze personality
-            personality_analysis = await generate_llm_response(prompt, max_tokens=200)
-            profile.personality_traits = personality_analysis
-
-            # Infer user interests
-            interests_prompt = get_interests_prompt(conversation_history)
-            interests_summary = await generate_llm_response(interests_prompt, max_tokens=100)
-            profile.interests = interests_summary
-
-            profile.chatbot_state = None
-            # Save updated profile
-            with open(USER_PROFILES_FILE, "w") as f:
-                json.dump({k: v.dict() for k, v in user_profiles.items()}, f, indent=4)
-
-            return {"user_id": user_id, "response": f"Thank you for sharing your location ({profile.location}). Here's a brief analysis of your personality based on your responses: {personality_analysis}", "is_assessment_complete": True}
+            conversation_history = session.conversation_history()
+
+            if defer_analysis:
+                return {"user_id": user_id, "response": f"Thank you for sharing your location ({profile.location}). Your personality analysis is being prepared and will appear in your profile shortly.", "is_assessment_complete": True}
+
+            apply_assessment_analysis(profile, await analyze_assessment(conversation_history, profile, detailed=True))
+            personality_analysis = profile.personality_traits
+            return {"user_id": user_id, "response": location_thanks_message(profile.location) + personality_analysis, "is_assessment_complete": True}
         else:
-            conversation_history = "\n".join(responses)
-            prompt = get_personality_inference_prompt(conversation_history)
-            personality_summary = await generate_llm_response(prompt, max_tokens=100)
-            profile.personality_traits = personality_summary
-
-            # Infer user interests
-            interests_prompt = get_interests_prompt(conversation_history)
-            interests_summary = await generate_llm_response(interests_prompt, max_tokens=100)
-            profile.interests = interests_summary
-
-            profile.chatbot_state = None
-            # Save user profiles to file
-            with open(USER_PROFILES_FILE, "w") as f:
-                json.dump({k: v.dict() for k, v in user_profiles.items()}, f, indent=4)
+            conversation_history = session.conversation_history()
+
+            if not defer_analysis:
+                apply_assessment_analysis(profile, await analyze_assessment(conversation_history, profile, detailed=False))
             return {"user_id": user_id, "response": "Thank you for completing the personality questions. We are now processing your responses.", "is_assessment_complete": True}
 
+async def analyze_assessment(conversation_history: str, profile: LearnerProfile, detailed: bool) -> AssessmentAnalysis:
+    """Infers personality traits and interests (and, in structured mode, focus areas) from the answers.
+
+    In structured mode this is a single JSON-schema completion; otherwise, or if
+    that fails, the personality and interests prompts run concurrently.
+    """
+    if STRUCTURED_ASSESSMENT:
+        prompt = get_combined_assessment_prompt(conversation_history, profile.dict(), FOCUS_AREAS)
+        analysis = await generate_structured_llm_response(prompt, AssessmentAnalysis, max_tokens=600)
+        if analysis is not None:
+            analysis.focus_areas = [rec for rec in analysis.focus_areas if rec.focus_area in FOCUS_AREAS]
+            return analysis
+
+    if detailed:
+        personality_request = generate_llm_response(get_detailed_personality_analysis_prompt(conversation_history), max_tokens=200)
+    else:
+        personality_request = generate_llm_response(get_personality_inference_prompt(conversation_history), max_tokens=100)
+    interests_request = generate_llm_response(get_interests_prompt(conversation_history), max_tokens=100)
+    personality_traits, interests = await asyncio.gather(personality_request, interests_request)
+    return AssessmentAnalysis(personality_traits=personality_traits, interests=interests, focus_areas=[])
+
+def apply_assessment_analysis(profile: LearnerProfile, analysis: AssessmentAnalysis):
+    profile.personality_traits = analysis.personality_traits
+    profile.interests = analysis.interests
+    profile.focus_recommendations = [rec.model_dump() for rec in analysis.focus_areas] or None
+
+def is_final_step(profile: LearnerProfile, session: Optional[ChatbotSession]) -> bool:
+    """True when the next message completes the assessment and triggers the analysis."""
+    return (session is not None and session.step == Step.PERSONALITY_QUESTIONS
+            and session.question_index >= len(PERSONALITY_QUESTIONS)
+            and profile.location_asked)
+
+async def complete_analysis_in_background(user_id: str, conversation_history: str, detailed: bool) -> dict:
+    """Job handler that fills in the analysis of an assessment whose completion was already acknowledged."""
+    profile = await get_profile(user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User profile not found.")
+    analysis = await analyze_assessment(conversation_history, profile, detailed)
+    for _ in range(BACKGROUND_SAVE_ATTEMPTS):
+        profile, version = await load_profile_versioned(user_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="User profile not found.")
+        apply_assessment_analysis(profile, analysis)
+        try:
+            await save_profile(user_id, profile, expected_version=version)
+            return {"personality_traits": profile.personality_traits, "interests": profile.interests}
+        except VersionConflictError:
+            continue
+    logger.error("Gave up saving the background analysis for user %s after %d conflicting writes.", user_id, BACKGROUND_SAVE_ATTEMPTS)
+    raise HTTPException(status_code=409, detail="The profile kept changing while the analysis was being saved.")
+
+async def schedule_background_analysis(user_id: str, conversation_history: str, detailed: bool) -> str:
+    # The user has already been told the analysis is coming, so this job is never refused for a full queue
+    job = await job_queue.submit("assessment_analysis", user_id, {"conversation_history": conversation_history, "detailed": detailed},
+                                 JOB_PRIORITIES["assessment_analysis"], enforce_limit=False)
+    return job["job_id"]
+
+def location_thanks_message(location: str) -> str:
+    return f"Thank you for sharing your location ({location}). Here's a brief analysis of your personality based on your responses: "
+
+def is_awaiting_location(profile: LearnerProfile, session: Optional[ChatbotSession]) -> bool:
+    """True when the next message is the location answer that completes the assessment."""
+    return is_final_step(profile, session) and not profile.location
+
+@app.post("/chatbot/interact/stream")
+async def chatbot_interact_stream(request: ChatbotInteractionRequest):
+    """Same state machine as /chatbot/interact, as server-sent events.
+
+    Emits `delta` events with text as it is generated, then a final `done` event
+    carrying the ChatbotResponse (or an `error` event). In structured assessment
+    mode, or with the analysis run in the background, the completing message is
+    answered as a single delta.
+    """
+    user_id = request.user_id
+    profile, version = await load_profile_versioned(user_id)
+    session = ChatbotSession.from_dict(profile.chatbot_state) if profile else None
+
+    # Only the streamed two-call analysis has text worth streaming; the structured single call and
+    # the deferred background analysis are handled (and their results stored) by the regular endpoint
+    if (profile is None or session is None or session.is_expired() or not is_awaiting_location(profile, session)
+            or STRUCTURED_ASSESSMENT or ASSESSMENT_ANALYSIS_IN_BACKGROUND):
+        response = await chatbot_interact(request)
+        async def single_event():
+            yield format_sse("delta", {"text": response["response"]})
+            yield format_sse("done", response)
+        return StreamingResponse(single_event(), media_type="text/event-stream")
+
+    async def events():
+        profile.location = request.message
+        conversation_history = session.conversation_history()
+        message = location_thanks_message(profile.location)
+        yield format_sse("delta", {"text": message})
+
+        # Interests are inferred concurrently while the personality analysis streams
+        interests_task = asyncio.create_task(generate_llm_response(get_interests_prompt(conversation_history), max_tokens=100))
+        chunks = []
+        try:
+            async for chunk in stream_llm_response(get_detailed_personality_analysis_prompt(conversation_history), max_tokens=200):
+                chunks.append(chunk)
+                yield format_sse("delta", {"text": chunk})
+            profile.interests = await interests_task
+        except LLMError as e:
+            interests_task.cancel()
+            # Nothing is saved, so the user can simply resend their location
+            yield format_sse("error", {"status_code": e.status_code, "detail": "The language model is temporarily unavailable. Please resend your location shortly."})
+            return
+        except BaseException:
+            interests_task.cancel()  # The client went away; don't leave the interests call running
+            raise
+        profile.personality_traits = "".join(chunks)
+        profile.focus_recommendations = None  # Ranked for the previous answers, if any
+        profile.chatbot_state = None
+
+        try:
+            await save_profile(user_id, profile, expected_version=version)
+        except VersionConflictError:
+            yield format_sse("error", {"status_code": 409, "detail": "Your profile was updated by another request. Please resend your message."})
+            return
+        yield format_sse("done", {"user_id": user_id, "response": message + profile.personality_traits, "is_assessment_complete": True})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def build_focus_response(recommendations: List[Tuple[str, str]]) -> dict:
+    recommended_focus_areas = [focus for focus, _ in recommendations]
+    reasoning_text = "\n".join([f"{focus}: {reasoning}" for focus, reasoning in recommendations])
+    return {"recommended_focus_areas": recommended_focus_areas, "reasoning": reasoning_text}
+
 @app.post("/recommend/focus", response_model=FocusRecommendationResponse)
 async def recommend_focus_areas_llm(user_id: str = Body(..., embed=True)):
-    profile = user_profiles.get(user_id)
+    profile = await get_profile(user_id)
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found.")
 
-    print("Learner Profile received for /recommend/focus:", profile.dict())
-    prompt = get_focus_recommendation_prompt(profile.dict(), FOCUS_AREAS)
-    print("Prompt being sent to LLM:", prompt)
+    return build_focus_response(await recommend_focus_for_profile(user_id, profile))
 
-    llm_response = await generate_llm_response(prompt, model="gpt-4o-mini", max_tokens=350)
-    recommended_focus_areas = parse_llm_list_response(llm_response)
-    reasoning_dict = parse_llm_reasoning_response(llm_response)
-    reasoning_text = "\n".join([f"{focus}: {reasoning_dict.get(focus, '')}" for focus in recommended_focus_areas])
-    return {"recommended_focus_areas": recommended_focus_areas, "reasoning": reasoning_text}
+def stored_focus_recommendations(profile: LearnerProfile) -> List[Tuple[str, str]]:
+    """The focus areas ranked by the structured assessment, minus any no longer in FOCUS_AREAS."""
+    return [(rec["focus_area"], rec["reasoning"]) for rec in profile.focus_recommendations or [] if rec.get("focus_area") in FOCUS_AREAS]
+
+async def recommend_focus_for_profile(user_id: str, profile: LearnerProfile) -> List[Tuple[str, str]]:
+    """Ranked (focus_area, reasoning) recommendations for a profile, never failing on LLM errors."""
+    stored = stored_focus_recommendations(profile)
+    if stored:
+        # Already ranked by the structured assessment; no need for another LLM call
+        return stored
+
+    if FOCUS_RANKING_MODE == "local":
+        return local_focus_recommendations(profile.dict())
+
+    prompt = get_focus_recommendation_prompt(profile.dict(), candidate_focus_areas(profile.dict()))
+    # Sampled, and without the profile or prompt text, which contain personal data
+    log_sampled(logging.DEBUG, "Focus recommendation for user %s: prompt of %d characters.", user_id, len(prompt))
+
+    try:
+        llm_response = await generate_llm_response(prompt, model="gpt-4o-mini", max_tokens=350)
+        recommendations = parse_focus_recommendations(llm_response)
+    except LLMError as e:
+        logger.warning("Focus recommendation LLM call failed, using local ranking: %s", e)
+        recommendations = []
+    # Fall back to the local ranking if the LLM gave us nothing usable
+    return recommendations or local_focus_recommendations(profile.dict())
+
+@app.post("/recommend/focus/stream")
+async def recommend_focus_areas_llm_stream(user_id: str = Body(..., embed=True)):
+    """Same as /recommend/focus, as server-sent events.
+
+    Emits a `recommendation` event ({"focus_area", "reasoning"}) as soon as each
+    block of the LLM output is complete, then a final `done` event carrying the
+    FocusRecommendationResponse.
+    """
+    profile = await get_profile(user_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User profile not found.")
+
+    recommendations = stored_focus_recommendations(profile)
+    if recommendations or FOCUS_RANKING_MODE == "local":
+        if not recommendations:
+            recommendations = local_focus_recommendations(profile.dict())
+        async def precomputed_events():
+            for focus_area, reasoning in recommendations:
+                yield format_sse("recommendation", {"focus_area": focus_area, "reasoning": reasoning})
+            yield format_sse("done", build_focus_response(recommendations))
+        return StreamingResponse(precomputed_events(), media_type="text/event-stream")
+
+    prompt = get_focus_recommendation_prompt(profile.dict(), candidate_focus_areas(profile.dict()))
+
+    async def events():
+        parser = FocusRecommendationParser()
+        recommendations = []
+        try:
+            async for chunk in stream_llm_response(prompt, model="gpt-4o-mini", max_tokens=350):
+                for focus_area, reasoning in parser.feed(chunk):
+                    recommendations.append((focus_area, reasoning))
+                    yield format_sse("recommendation", {"focus_area": focus_area, "reasoning": reasoning})
+        except LLMError as e:
+            logger.warning("Focus recommendation stream failed: %s", e)
+        remaining = parser.close()
+        if not recommendations and not remaining:
+            remaining = local_focus_recommendations(profile.dict())  # Nothing usable came back from the LLM
+        for focus_area, reasoning in remaining:
+            recommendations.append((focus_area, reasoning))
+            yield format_sse("recommendation", {"focus_area": focus_area, "reasoning": reasoning})
+        yield format_sse("done", build_focus_response(recommendations))
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @app.post("/recommend/careers", response_model=CareerRecommendationResponse)
 async def recommend_careers(user_id: str = Body(..., embed=True), chosen_focus_area: str = Body(..., embed=True)):
     try:
-        profile = user_profiles.get(user_id)
-        if not profile:
-            raise HTTPException(status_code=404, detail="User profile not found.")
+        return await build_career_recommendations(user_id, chosen_focus_area)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in /recommend/careers: %s", e)
+        raise HTTPException(status_code=500, detail="Internal server error.");
+
+async def build_career_recommendations(user_id: str, chosen_focus_area: str) -> dict:
+    profile = await get_profile(user_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User profile not found.")
 
-        if chosen_focus_area not in CAREER_RECOMMENDATIONS:
-            raise HTTPException(status_code=400, detail="Invalid chosen_focus_area.")
+    if chosen_focus_area not in CAREER_RECOMMENDATIONS:
+        raise HTTPException(status_code=400, detail="Invalid chosen_focus_area.")
 
-        career_names = CAREER_RECOMMENDATIONS[chosen_focus_area]
-        recommended_careers = []
-        for career_name in career_names:
-            prompt = get_job_description_prompt(career_name)
-            description = await generate_llm_response(prompt, max_tokens=30)
-            recommended_careers.append({"name": career_name, "description": description})
+    # Best-matching careers for this learner first
+    career_names = [career for career, _ in rank_careers(profile.dict(), chosen_focus_area)]
+    llm_requests = [(get_job_description_prompt(career_name), 30) for career_name in career_names]
+    llm_requests.append((get_soft_skills_prompt(chosen_focus_area), 100))
+    # These prompts depend only on the constants tables, so they are served from the response cache
+    results = await generate_llm_responses(llm_requests, concurrency=CAREER_FANOUT_CONCURRENCY, use_cache=True)
 
-        soft_skills_prompt = get_soft_skills_prompt(chosen_focus_area)
-        soft_skills_explanation = await generate_llm_response(soft_skills_prompt, max_tokens=100)
+    recommended_careers = []
+    for career_name, description in zip(career_names, results):
+        if isinstance(description, Exception):
+            logger.warning("Failed to describe career %s: %s", career_name, description)
+            description = "Description unavailable."
+        recommended_careers.append({"name": career_name, "description": description})
 
-        return {"recommended_careers": recommended_careers, "soft_skills": soft_skills_explanation}
+    soft_skills_explanation = results[-1]
+    if isinstance(soft_skills_explanation, Exception):
+        logger.warning("Failed to explain soft skills for %s: %s", chosen_focus_area, soft_skills_explanation)
+        soft_skills_explanation = "Soft skills information unavailable."
+
+    return {"recommended_careers": recommended_careers, "soft_skills": soft_skills_explanation}
+
+@app.post("/assessments/batch")
+async def batch_assessments(request: Request):
+    """Runs the assessment pipeline for a cohort uploaded as JSONL (one BatchAssessmentItem per line).
+
+    Personality, interests and focus recommendations are generated for up to
+    BATCH_CONCURRENCY learners at a time. Results stream back as JSON lines in
+    completion order, followed by a summary line. Successful profiles replace any
+    existing ones, written BATCH_SAVE_CHUNK at a time in the background, so
+    what has completed is kept even if the client disconnects.
+    """
+    lines = (await request.body()).decode("utf-8").splitlines()
+    items, invalid = [], []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = BatchAssessmentItem.model_validate_json(line)
+        except ValidationError as e:
+            invalid.append({"line": line_number, "error": f"Invalid record: {e.errors()[0]['msg']}"})
+            continue
+        if not item.answers:
+            invalid.append({"line": line_number, "user_id": item.user_id, "error": "No answers provided."})
+            continue
+        items.append(item)
+    if len(items) > BATCH_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_USERS} users.")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def assess(item: BatchAssessmentItem):
+        async with semaphore:
+            try:
+                return item.user_id, await run_batch_assessment(item), None
+            except LLMError as e:
+                return item.user_id, None, str(e)
+            except Exception as e:
+                # One malformed completion must not end the stream for everyone else
+                logger.exception("Batch assessment failed for user %s: %s", item.user_id, e)
+                return item.user_id, None, "The assessment could not be completed."
+
+    async def results():
+        for entry in invalid:
+            yield json.dumps(entry) + "\n"
+        succeeded, pending, saves = 0, [], []
+
+        def flush():
+            # Writes run in their own tasks, so they finish even if this response is cancelled
+            if pending:
+                task = asyncio.create_task(save_batch_chunk(list(pending)))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
+                saves.append((len(pending), task))
+                pending.clear()
+
+        tasks = [asyncio.create_task(assess(item)) for item in items]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                user_id, profile, error = await next_result
+                if profile is None:
+                    yield json.dumps({"user_id": user_id, "error": error}) + "\n"
+                    continue
+                succeeded += 1
+                pending.append((user_id, profile.dict()))
+                if len(pending) >= BATCH_SAVE_CHUNK:
+                    flush()
+                yield json.dumps({"user_id": user_id, "personality_traits": profile.personality_traits, "interests": profile.interests,
+                                  "recommended_focus_areas": [rec["focus_area"] for rec in profile.focus_recommendations or []]}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()  # No-op for finished tasks; stops the rest if the client disconnects
+            flush()
+
+        saved = await asyncio.gather(*(asyncio.shield(task) for _, task in saves))
+        persisted = sum(count for (count, _), ok in zip(saves, saved) if ok)
+        yield json.dumps({"summary": {"succeeded": succeeded, "failed": len(items) - succeeded + len(invalid), "persisted": persisted}}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+async def save_batch_chunk(chunk: List[Tuple[str, dict]]) -> bool:
+    try:
+        await asyncio.to_thread(profile_store.save_many, chunk)
+        return True
     except Exception as e:
-        print(f"Error in /recommend/careers: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error.");
\ No newline at end of file
+        logger.exception("Failed to persist %d batch profiles: %s", len(chunk), e)
+        return False
+
+async def run_batch_assessment(item: BatchAssessmentItem) -> LearnerProfile:
+    profile = LearnerProfile(**item.model_dump(exclude={"user_id", "answers"}), location_asked=True)
+    conversation_history = "\n".join(f"User: {answer}" for answer in item.answers)
+    apply_assessment_analysis(profile, await analyze_assessment(conversation_history, profile, detailed=True))
+    if not profile.focus_recommendations:
+        recommendations = await recommend_focus_for_profile(item.user_id, profile)
+        profile.focus_recommendations = [{"focus_area": focus_area, "reasoning": reasoning} for focus_area, reasoning in recommendations]
+    return profile
+
+# --- Background Jobs ---
+async def focus_recommendations_job(user_id: str) -> dict:
+    profile = await get_profile(user_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User profile not found.")
+    return build_focus_response(await recommend_focus_for_profile(user_id, profile))
+
+async def career_recommendations_job(user_id: str, chosen_focus_area: str) -> dict:
+    return await build_career_recommendations(user_id, chosen_focus_area)
+
+job_queue.register("assessment_analysis", complete_analysis_in_background)
+job_queue.register("focus_recommendations", focus_recommendations_job)
+job_queue.register("career_recommendations", career_recommendations_job)
+
+async def submit_job(kind: str, user_id: str, params: dict, priority: Optional[int]) -> JSONResponse:
+    """Queues a job and answers 202 with its status and where to poll it."""
+    default = JOB_PRIORITIES[kind]
+    priority = default if priority is None else min(max(priority, default), default + JOB_PRIORITY_RANGE)
+    try:
+        job = await job_queue.submit(kind, user_id, params, priority)
+    except JobQueueFullError:
+        raise HTTPException(status_code=503, detail="Too many jobs are queued. Please try again shortly.", headers={"Retry-After": "5"})
+    return JSONResponse(status_code=202, content=job_view(job), headers={"Location": f"/jobs/{job['job_id']}"})
+
+@app.post("/jobs/focus", status_code=202)
+async def submit_focus_job(request: FocusJobRequest):
+    """Queues /recommend/focus as a background job; poll GET /jobs/{job_id}/result for the FocusRecommendationResponse."""
+    if not await get_profile(request.user_id):
+        raise HTTPException(status_code=404, detail="User profile not found.")
+    return await submit_job("focus_recommendations", request.user_id, {}, request.priority)
+
+@app.post("/jobs/careers", status_code=202)
+async def submit_careers_job(request: CareerJobRequest):
+    """Queues /recommend/careers as a background job; poll GET /jobs/{job_id}/result for the CareerRecommendationResponse."""
+    if not await get_profile(request.user_id):
+        raise HTTPException(status_code=404, detail="User profile not found.")
+    if request.chosen_focus_area not in CAREER_RECOMMENDATIONS:
+        raise HTTPException(status_code=400, detail="Invalid chosen_focus_area.")
+    return await submit_job("career_recommendations", request.user_id, {"chosen_focus_area": request.chosen_focus_area}, request.priority)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job_view(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """The job's result once it succeeded; 202 while it is queued or running; its error status if it failed."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    if job["status"] in (QUEUED, RUNNING):
+        return JSONResponse(status_code=202, content=job_view(job), headers={"Retry-After": "1"})
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=job["status_code"] or 500, detail=job["error"])
+    return job["result"]
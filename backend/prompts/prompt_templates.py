@@ -1,60 +1,95 @@
+from functools import lru_cache
 from typing import Optional
+from utils.token_budget import count_tokens, fit_fields, PROMPT_HISTORY_MAX_TOKENS
+
+# Each prompt is a fixed instruction prefix, built once at import, followed by the
+# per-request data. Keeping everything that varies at the end lets the provider's
+# prompt cache reuse the prefix across users, and only the data is subject to the
+# token budget.
+
+HISTORY_CAP = {"conversation_history": PROMPT_HISTORY_MAX_TOKENS}
+
+@lru_cache(maxsize=None)
+def _static_tokens(*parts: str) -> int:
+    return count_tokens("".join(parts))
+
+INTERESTS_PREFIX = """What are the user's primary interests, based on the conversation history below? Provide a brief summary.
+
+Conversation history:
+"""
 
 def get_interests_prompt(conversation_history: str) -> str:
     """Generates a prompt for inferring the user's interests based on the conversation history."""
-    return f"""Based on the following conversation history:
+    fields = fit_fields({"conversation_history": conversation_history}, _static_tokens(INTERESTS_PREFIX), HISTORY_CAP)
+    return INTERESTS_PREFIX + fields["conversation_history"]
 
-    {conversation_history}
+FOCUS_RECOMMENDATION_PREFIX = """You are an expert career advisor. A learner, whose profile is given below, has requested your advice on potential focus areas.
 
-    What are the user's primary interests? Provide a brief summary.
-    """
+Instructions:
+1. Carefully consider the learner's profile and the available focus areas.
+2. **Select 3-5 focus areas from the available list that are the BEST FIT for this learner.**
+3. **For EACH selected focus area, provide a concise and UNIQUE explanation (1-2 sentences) of WHY it is a good fit, highlighting specific aspects of the learner's profile that align with the focus area.**
+4. **Do not repeat the same reasoning for different focus areas.**
 
-def get_focus_recommendation_prompt(profile: dict, focus_areas: list):
-    prompt_parts = ["You are an expert career advisor. A learner with the following profile has requested your advice on potential focus areas:", "\nAvailable Focus Areas:", ", ".join(focus_areas), "\nInstructions:", "1. Carefully consider the learner's profile and the available focus areas.", "2. **Select 3-5 focus areas from the list above that are the BEST FIT for this learner.**", "3. **For EACH selected focus area, provide a concise and UNIQUE explanation (1-2 sentences) of WHY it is a good fit, highlighting specific aspects of the learner's profile that align with the focus area.**", "4. **Do not repeat the same reasoning for different focus areas.**", "\nOutput Format:", "Focus Area 1: [Name of Focus Area from the list]", "Reasoning: [Your unique explanation]", "\nFocus Area 2: [Name of Focus Area from the list]", "Reasoning: [Your unique explanation]", "... (and so on)", "\nRecommendations:"]
+Output Format:
+Focus Area 1: [Name of Focus Area from the list]
+Reasoning: [Your unique explanation]
+
+Focus Area 2: [Name of Focus Area from the list]
+Reasoning: [Your unique explanation]
+
+... (and so on)
 
-    profile_details = []
+Available Focus Areas: """
+FOCUS_RECOMMENDATION_SUFFIX = "\n\nRecommendations:"
+
+def get_focus_recommendation_prompt(profile: dict, focus_areas: list):
+    details = {}
     if profile.get('age'):
-        profile_details.append(f"Age: {profile['age']}")
+        details["Age"] = str(profile['age'])
     if profile.get('passion'):
-        profile_details.append(f"Passion: {profile['passion']}")
+        details["Passion"] = profile['passion']
     if profile.get('interests') and profile['interests'] != 'Not specified':
-        profile_details.append(f"Interests: {profile['interests']}")
+        details["Interests"] = profile['interests']
     personality_traits = profile.get('personality_traits')
     if personality_traits and personality_traits != 'Not specified':
-        profile_details.append(f"Personality Traits: {personality_traits}")
+        details["Personality Traits"] = personality_traits
 
-    if profile_details:
-        prompt_parts.insert(1, "Learner Profile:")
-        for detail in profile_details:
-            prompt_parts.insert(2, f"- {detail}")
+    focus_area_list = ", ".join(focus_areas)
+    details = fit_fields(details, _static_tokens(FOCUS_RECOMMENDATION_PREFIX, FOCUS_RECOMMENDATION_SUFFIX) + count_tokens(focus_area_list))
+    if details:
+        profile_text = "Learner Profile:\n" + "\n".join(f"- {name}: {value}" for name, value in details.items())
     else:
-        prompt_parts.insert(1, "Learner Profile: No specific information provided yet.")
+        profile_text = "Learner Profile: No specific information provided yet."
+    return FOCUS_RECOMMENDATION_PREFIX + focus_area_list + "\n\n" + profile_text + FOCUS_RECOMMENDATION_SUFFIX
 
-    prompt = " ".join(prompt_parts)
-    return prompt
+CAREER_PROFILE_FIELDS = (("age", "Age", "Not specified"), ("educational_background", "Educational Background", "Not provided."),
+                         ("professional_experience", "Professional Experience", "Not provided."), ("passion", "Passion", "Not specified."),
+                         ("skills", "Skills", "Not provided."), ("interests", "Interests", "Not specified."),
+                         ("values", "Values", "Not provided."), ("career_goals", "Career Goals", "Not provided."))
+
+CAREER_RECOMMENDATION_PREFIX = """Suggest 3-5 potential career paths within the learner's chosen focus area, and briefly explain why these careers might be a good fit, based on the learner profile below.
+
+"""
 
 def get_career_recommendation_prompt(profile: dict, chosen_focus_area: str, location: Optional[str] = None):
-    personality_info = f"Personality Traits (inferred from chat): {profile.get('personality_traits')}" if profile.get('personality_traits') else "No personality information inferred yet."
-    location_context = f"Knowing the user is in {location}," if location else ""
-    return f"""Based on the following learner profile with a chosen focus area of '{chosen_focus_area}':
-    Age: {profile.get('age', 'Not specified')}
-    Educational Background: {profile.get('educational_background', 'Not provided.')}
-    Professional Experience: {profile.get('professional_experience', 'Not provided.')}
-    Passion: {profile.get('passion', 'Not specified.')}
-    Skills: {profile.get('skills', 'Not provided.')}
-    Interests: {profile.get('interests', 'Not specified.')}
-    Values: {profile.get('values', 'Not provided.')}
-    Career Goals: {profile.get('career_goals', 'Not provided.')}
-    {personality_info}
-
-    {location_context} suggest 3-5 potential career paths within '{chosen_focus_area}'. Briefly explain why these careers might be a good fit.
-    """
+    fields = {label: str(profile.get(key) or default) for key, label, default in CAREER_PROFILE_FIELDS}
+    fields["Personality Traits (inferred from chat)"] = profile.get('personality_traits') or "No personality information inferred yet."
+    fields = fit_fields(fields, _static_tokens(CAREER_RECOMMENDATION_PREFIX))
+    lines = [f"Chosen Focus Area: {chosen_focus_area}"]
+    if location:
+        lines.append(f"Location: {location}")
+    lines += [f"{label}: {value}" for label, value in fields.items()]
+    return CAREER_RECOMMENDATION_PREFIX + "\n".join(lines)
+
+PERSONALITY_INFERENCE_PREFIX = """Infer the user's key personality traits relevant to career choices from the conversation below. Provide a concise summary of their personality in 2-3 sentences.
+
+Conversation:
+"""
 
 def get_personality_inference_prompt(conversation_history: str):
-    return f"""Based on the following conversation, infer the user's key personality traits relevant to career choices:
-    {conversation_history}
-    Provide a concise summary of their personality in 2-3 sentences.
-    """
+    fields = fit_fields({"conversation_history": conversation_history}, _static_tokens(PERSONALITY_INFERENCE_PREFIX), HISTORY_CAP)
+    return PERSONALITY_INFERENCE_PREFIX + fields["conversation_history"]
 
 def get_job_description_prompt(job_title: str) -> str:
     """Generates a prompt for getting a one-line job description."""
@@ -64,18 +99,51 @@ def get_soft_skills_prompt(focus_area: str) -> str:
     """Generates a prompt for getting a natural language explanation of relevant soft skills for a focus area."""
     return f"""Explain in a few sentences the key soft skills that are generally important for professionals working in the field of {focus_area}."""
 
-def get_detailed_personality_analysis_prompt(conversation_history: str) -> str:
-    """Generates a prompt for a more detailed analysis of the user's personality based on their answers."""
-    return f"""You are an expert in personality analysis for career guidance. Based on the following conversation where the user answered questions about their preferences and tendencies:
+DETAILED_PERSONALITY_ANALYSIS_PREFIX = """You are an expert in personality analysis for career guidance. Below is a conversation where the user answered questions about their preferences and tendencies.
+
+Analyze the user's responses to identify their key personality traits. Provide a summary of their personality that includes:
 
-    {conversation_history}
+- Their likely tendencies in social situations (e.g., introverted, extroverted, comfortable in groups).
+- Their approach to tasks and challenges (e.g., organized, spontaneous, persistent, adaptable).
+- Their emotional style (e.g., calm, expressive, empathetic, analytical).
+- Any other relevant personality characteristics that stand out from their answers.
 
-    Analyze the user's responses to identify their key personality traits. Provide a summary of their personality that includes:
+Structure your analysis as a few short paragraphs, providing a holistic view of the user's personality as revealed through their responses. Focus on aspects that would be relevant to making career recommendations.
 
-    - Their likely tendencies in social situations (e.g., introverted, extroverted, comfortable in groups).
-    - Their approach to tasks and challenges (e.g., organized, spontaneous, persistent, adaptable).
-    - Their emotional style (e.g., calm, expressive, empathetic, analytical).
-    - Any other relevant personality characteristics that stand out from their answers.
+Conversation:
+"""
 
-    Structure your analysis as a few short paragraphs, providing a holistic view of the user's personality as revealed through their responses. Focus on aspects that would be relevant to making career recommendations.
-    """
\ No newline at end of file
+def get_detailed_personality_analysis_prompt(conversation_history: str) -> str:
+    """Generates a prompt for a more detailed analysis of the user's personality based on their answers."""
+    fields = fit_fields({"conversation_history": conversation_history}, _static_tokens(DETAILED_PERSONALITY_ANALYSIS_PREFIX), HISTORY_CAP)
+    return DETAILED_PERSONALITY_ANALYSIS_PREFIX + fields["conversation_history"]
+
+COMBINED_ASSESSMENT_PREFIX = """You are an expert in personality analysis and career guidance. A learner, whose profile is given below, answered questions about their preferences and tendencies.
+
+Respond with JSON containing:
+- personality_traits: a short paragraph on their social tendencies, approach to tasks, emotional style and any other traits relevant to career choices.
+- interests: a brief summary of their primary interests.
+- focus_areas: the 3-5 focus areas from the available list that are the BEST FIT, best first. Use the exact names from the list, and give each a concise, UNIQUE reasoning (1-2 sentences) tied to specific aspects of the learner.
+
+Available Focus Areas: """
+
+def get_combined_assessment_prompt(conversation_history: str, profile: dict, focus_areas: list) -> str:
+    """Generates a prompt that analyzes personality and interests and ranks focus areas in a single JSON completion."""
+    # The focus area list is the same for every learner, so it stays in the cacheable prefix
+    focus_area_list = ", ".join(focus_areas)
+    fields = {"conversation_history": conversation_history}
+    for key in ('age', 'passion', 'location'):
+        if profile.get(key):
+            fields[key] = str(profile[key])
+    fields = fit_fields(fields, _static_tokens(COMBINED_ASSESSMENT_PREFIX) + count_tokens(focus_area_list), HISTORY_CAP)
+
+    profile_lines = [f"{key.capitalize()}: {fields[key]}" for key in ('age', 'passion', 'location') if key in fields]
+    profile_text = "\n".join(profile_lines) if profile_lines else "No specific information provided yet."
+    return f"""{COMBINED_ASSESSMENT_PREFIX}{focus_area_list}
+
+Learner Profile:
+{profile_text}
+
+Conversation:
+{fields["conversation_history"]}
+"""
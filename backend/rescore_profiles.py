@@ -0,0 +1,177 @@
+"""Re-scores focus recommendations for every stored profile through a batch backend.
+
+A job lives in its own directory and moves through prepare -> submit -> download
+-> merge; each stage is checkpointed in job.json, so re-running the same command
+resumes where it stopped. Profiles that changed after prepare are left alone, so
+a user's newer assessment is never overwritten with a stale re-score.
+
+Usage (from the backend directory):
+    python rescore_profiles.py run --job-dir jobs/rescore-2026-10-18            # local backend
+    python rescore_profiles.py run --job-dir jobs/rescore-2026-10-18 --backend openai
+    python rescore_profiles.py status --job-dir jobs/rescore-2026-10-18
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from utils.batch_backends import create_batch_backend
+from utils.focus_ranking import candidate_focus_areas
+from utils.helper_functions import parse_focus_recommendations
+from utils.model_generations import close_llm_client
+from utils.profile_store import create_profile_store, PROFILE_STORE_BACKEND, VersionConflictError
+from prompts.prompt_templates import get_focus_recommendation_prompt
+
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 350
+STAGES = ("new", "prepared", "submitted", "downloaded", "merged")
+
+class Job:
+    def __init__(self, job_dir: str):
+        self.dir = job_dir
+        os.makedirs(job_dir, exist_ok=True)
+        self.state_path = os.path.join(job_dir, "job.json")
+        self.requests_path = os.path.join(job_dir, "requests.jsonl")
+        self.results_path = os.path.join(job_dir, "results.jsonl")
+        self.versions_path = os.path.join(job_dir, "versions.json")  # Profile versions the requests were built from
+        self.merged_path = os.path.join(job_dir, "merged.txt")
+        self.state = {"stage": "new"}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+
+    def save(self, **updates):
+        self.state.update(updates, updated_at=time.time())
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    def versions(self) -> dict:
+        try:
+            with open(self.versions_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def reached(self, stage: str) -> bool:
+        return STAGES.index(self.state["stage"]) >= STAGES.index(stage)
+
+def prepare(job: Job, store) -> int:
+    """Writes one focus recommendation request per profile with a completed assessment."""
+    versions = {}
+    tmp_path = job.requests_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for user_id in store.user_ids():
+            profile, version = store.load_versioned(user_id)
+            if not profile or not (profile.get("personality_traits") or profile.get("interests")):
+                continue
+            prompt = get_focus_recommendation_prompt(profile, candidate_focus_areas(profile))
+            f.write(json.dumps({"custom_id": user_id, "method": "POST", "url": "/v1/chat/completions",
+                                "body": {"model": MODEL, "max_tokens": MAX_TOKENS, "messages": [{"role": "user", "content": prompt}]}}) + "\n")
+            versions[user_id] = version
+    with open(job.versions_path + ".tmp", "w") as f:
+        json.dump(versions, f)
+    os.replace(job.versions_path + ".tmp", job.versions_path)
+    os.replace(tmp_path, job.requests_path)
+    job.save(stage="prepared", requests=len(versions))
+    return len(versions)
+
+def load_results(results_path: str) -> dict:
+    """The last successful completion text per custom_id."""
+    results = {}
+    with open(results_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            response = result.get("response")
+            if response and response.get("status_code") == 200:
+                results[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+def merge(job: Job, store) -> int:
+    """Writes parsed recommendations back to the profiles, checkpointing each merged user.
+
+    A profile whose version moved on since prepare is skipped: its re-score was
+    computed from data the user has since replaced.
+    """
+    merged = set()
+    if os.path.exists(job.merged_path):
+        with open(job.merged_path) as f:
+            merged = {line.strip() for line in f if line.strip()}
+    versions = job.versions()
+
+    count = skipped = 0
+    with open(job.merged_path, "a") as checkpoint:
+        for user_id, content in load_results(job.results_path).items():
+            if user_id in merged:
+                continue
+            recommendations = parse_focus_recommendations(content)
+            if not recommendations:
+                continue
+            if user_id not in versions or not update_profile(store, user_id, recommendations, versions[user_id]):
+                skipped += 1
+                continue
+            count += 1
+            checkpoint.write(user_id + "\n")
+            checkpoint.flush()
+    if skipped:
+        print(f"Skipped {skipped} profiles that changed since the job was prepared.")
+    job.save(stage="merged", merged=len(merged) + count, skipped=skipped)
+    return count
+
+def update_profile(store, user_id: str, recommendations, expected_version: int) -> bool:
+    """Stores the recommendations if the profile is still at expected_version."""
+    profile, version = store.load_versioned(user_id)
+    if profile is None or version != expected_version:
+        return False
+    profile["focus_recommendations"] = [{"focus_area": focus_area, "reasoning": reasoning} for focus_area, reasoning in recommendations]
+    try:
+        store.save(user_id, profile, expected_version=expected_version)
+        return True
+    except VersionConflictError:
+        return False  # The user was active meanwhile
+
+async def run(job: Job, backend_name: str, concurrency: int, poll_interval: float):
+    if PROFILE_STORE_BACKEND != "sqlite":
+        # The JSON store caches the file and its versions per process, so writing from here
+        # would overwrite the app's newer changes and the version check could not see them
+        raise SystemExit("Re-scoring needs PROFILE_STORE_BACKEND=sqlite; the json backend is safe for a single process only.")
+    store = create_profile_store()
+    backend_name = job.state.get("backend", backend_name)
+    backend = create_batch_backend(backend_name, concurrency)
+    try:
+        if not job.reached("prepared"):
+            print(f"Prepared {prepare(job, store)} requests.")
+        if not job.reached("submitted"):
+            job.save(stage="submitted", backend=backend_name, batch_id=await backend.submit(job.requests_path))
+            print(f"Submitted batch {job.state['batch_id']} to the {backend_name} backend.")
+        if not job.reached("downloaded"):
+            while (status := await backend.status(job.state["batch_id"])) == "in_progress":
+                print(f"Batch {job.state['batch_id']} in progress; checking again in {poll_interval:.0f}s.")
+                await asyncio.sleep(poll_interval)
+            if status == "failed":
+                raise SystemExit(f"Batch {job.state['batch_id']} failed.")
+            await backend.download(job.state["batch_id"], job.results_path)
+            job.save(stage="downloaded")
+        print(f"Merged {merge(job, store)} profiles.")
+    finally:
+        await close_llm_client()
+        store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("run", "status"))
+    parser.add_argument("--job-dir", required=True, help="Directory holding the job's files and checkpoint.")
+    parser.add_argument("--backend", choices=("local", "openai"), default="local", help="Batch backend for a new job.")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight for the local backend.")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between status checks.")
+    args = parser.parse_args()
+
+    job = Job(args.job_dir)
+    if args.command == "status":
+        print(json.dumps(job.state, indent=4))
+    else:
+        asyncio.run(run(job, args.backend, args.concurrency, args.poll_interval))
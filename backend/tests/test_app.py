@@ -0,0 +1,108 @@
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+import app as backend
+from utils.chatbot_session import ChatbotSession, Step
+from utils.constants import FOCUS_AREAS, PERSONALITY_QUESTIONS
+from utils.job_queue import MemoryJobQueue
+from utils.profile_store import SQLiteProfileStore
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = SQLiteProfileStore(str(tmp_path / "profiles.db"), legacy_file=None)
+    monkeypatch.setattr(backend, "profile_store", store)
+    return store
+
+@pytest.fixture
+def client(monkeypatch, store):
+    queue = MemoryJobQueue()
+    for kind, handler in backend.job_queue.handlers.items():
+        queue.register(kind, handler)
+    monkeypatch.setattr(backend, "job_queue", queue)
+    monkeypatch.setattr(backend, "CHATBOT_SESSION_SWEEP_INTERVAL", 0)
+    with TestClient(backend.app) as client:
+        yield client
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    """Replaces the LLM layer with canned answers and records which kind of call was made."""
+    calls = []
+
+    async def generate(prompt, **kwargs):
+        calls.append("text")
+        return "A thoughtful planner."
+
+    async def stream(prompt, **kwargs):
+        calls.append("stream")
+        for chunk in ("Streamed ", "traits."):
+            yield chunk
+
+    async def structured(prompt, schema, **kwargs):
+        calls.append("structured")
+        return schema(personality_traits="Calm.", interests="Art.", focus_areas=[{"focus_area": FOCUS_AREAS[0], "reasoning": "Fits."}])
+
+    monkeypatch.setattr(backend, "generate_llm_response", generate)
+    monkeypatch.setattr(backend, "stream_llm_response", stream)
+    monkeypatch.setattr(backend, "generate_structured_llm_response", structured)
+    return calls
+
+def save_awaiting_location(store, user_id):
+    """A profile whose next message is the location answer that completes the assessment."""
+    session = ChatbotSession(Step.PERSONALITY_QUESTIONS, len(PERSONALITY_QUESTIONS), ["yes"] * len(PERSONALITY_QUESTIONS))
+    store.save(user_id, backend.LearnerProfile(age=20, passion="art", location_asked=True, chatbot_state=session.to_dict()).model_dump())
+
+def sse_events(response):
+    events, event = [], None
+    for line in response.text.splitlines():
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            events.append((event, json.loads(line[len("data:"):])))
+    return events
+
+def test_stream_streams_the_two_call_analysis(client, store, llm_calls):
+    save_awaiting_location(store, "u")
+    events = sse_events(client.post("/chatbot/interact/stream", json={"user_id": "u", "message": "Lisbon"}))
+    assert [event for event, _ in events][-1] == "done"
+    assert sorted(llm_calls) == ["stream", "text"]
+    assert store.load("u")["personality_traits"] == "Streamed traits."
+
+def test_stream_uses_the_structured_call_when_enabled(client, store, llm_calls, monkeypatch):
+    monkeypatch.setattr(backend, "STRUCTURED_ASSESSMENT", True)
+    save_awaiting_location(store, "u")
+    events = sse_events(client.post("/chatbot/interact/stream", json={"user_id": "u", "message": "Lisbon"}))
+    assert [event for event, _ in events] == ["delta", "done"]
+    assert llm_calls == ["structured"]
+    assert store.load("u")["focus_recommendations"] == [{"focus_area": FOCUS_AREAS[0], "reasoning": "Fits."}]
+
+def test_stream_defers_the_analysis_when_enabled(client, store, llm_calls, monkeypatch):
+    monkeypatch.setattr(backend, "ASSESSMENT_ANALYSIS_IN_BACKGROUND", True)
+    save_awaiting_location(store, "u")
+    events = sse_events(client.post("/chatbot/interact/stream", json={"user_id": "u", "message": "Lisbon"}))
+    done = events[-1][1]
+    assert done["is_assessment_complete"] and done["job_id"]
+    assert "stream" not in llm_calls
+    for _ in range(100):
+        if client.get(f"/jobs/{done['job_id']}").json()["status"] == "succeeded":
+            break
+        time.sleep(0.02)
+    assert store.load("u")["personality_traits"] == "A thoughtful planner."
+
+def test_profile_etag_answers_304_until_the_profile_changes(client, store):
+    store.save("u", backend.LearnerProfile(age=20, passion="art").model_dump())
+    first = client.get("/users/u")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.json()["age"] == 20
+    assert client.get("/users/u", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/users/u", headers={"If-None-Match": "W/" + etag}).status_code == 304
+    store.save("u", backend.LearnerProfile(age=21, passion="art").model_dump())
+    changed = client.get("/users/u", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+def test_profile_fields_projection(client, store):
+    store.save("u", backend.LearnerProfile(age=20, passion="art").model_dump())
+    assert client.get("/users/u", params={"fields": "age"}).json() == {"age": 20}
+    assert client.get("/users/u", params={"fields": ","}).json() == client.get("/users/u").json()
+    assert client.get("/users/u", params={"fields": "age,nope"}).status_code == 400
+    assert client.get("/users/missing").status_code == 404
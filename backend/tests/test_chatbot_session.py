@@ -0,0 +1,47 @@
+import time
+from utils.chatbot_session import ChatbotSession, Step, is_session_stub, sweep_idle_sessions, CHATBOT_SESSION_TTL
+from utils.profile_store import SQLiteProfileStore
+from utils.constants import PERSONALITY_QUESTIONS
+
+def test_from_dict_reads_legacy_sessions():
+    session = ChatbotSession.from_dict({"step": "personality_questions", "question_index": 2,
+                                        "responses": ["User: I like people", "User: Planning ahead"]})
+    assert session.step == Step.PERSONALITY_QUESTIONS
+    assert session.question_index == 2
+    assert session.answers == ["I like people", "Planning ahead"]
+    assert session.conversation_history() == "User: I like people\nUser: Planning ahead"
+
+def test_legacy_sessions_without_timestamp_are_not_expired():
+    session = ChatbotSession.from_dict({"step": "ask_age"})
+    assert session.step == Step.ASK_AGE
+    assert not session.is_expired()
+
+def test_from_dict_caps_answers_at_question_count():
+    responses = ["User: yes"] * (len(PERSONALITY_QUESTIONS) + 5)
+    assert len(ChatbotSession.from_dict({"step": "personality_questions", "responses": responses}).answers) == len(PERSONALITY_QUESTIONS)
+
+def test_from_dict_of_nothing_is_none():
+    assert ChatbotSession.from_dict(None) is None
+    assert ChatbotSession.from_dict({}) is None
+
+def test_round_trip():
+    session = ChatbotSession(Step.PERSONALITY_QUESTIONS, 1, ["yes"], last_active=time.time() - 10)
+    restored = ChatbotSession.from_dict(session.to_dict())
+    assert (restored.step, restored.question_index, restored.answers, restored.last_active) == \
+        (session.step, session.question_index, session.answers, session.last_active)
+
+def test_is_session_stub():
+    assert is_session_stub({"age": 0, "passion": "", "chatbot_state": {"step": 1}})
+    assert not is_session_stub({"age": 20, "passion": "", "chatbot_state": {"step": 1}})
+
+def test_sweep_drops_idle_sessions_and_deletes_stubs(tmp_path):
+    store = SQLiteProfileStore(str(tmp_path / "profiles.db"), legacy_file=None)
+    now = time.time()
+    store.save("idle", {"age": 20, "chatbot_state": {"step": 1, "last_active": now - CHATBOT_SESSION_TTL - 10}})
+    store.save("stub", {"age": 0, "chatbot_state": {"step": 1, "last_active": now - CHATBOT_SESSION_TTL - 10}})
+    store.save("active", {"age": 20, "chatbot_state": {"step": 1, "last_active": now}})
+    assert sweep_idle_sessions(store, now) == 2
+    assert store.load("idle") == {"age": 20, "chatbot_state": None}
+    assert store.load("stub") is None
+    assert store.load("active")["chatbot_state"] is not None
+    store.close()
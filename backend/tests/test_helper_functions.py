@@ -0,0 +1,39 @@
+import pytest
+from utils.constants import FOCUS_AREAS
+from utils.helper_functions import FocusRecommendationParser, parse_focus_recommendations
+
+FIRST, SECOND = FOCUS_AREAS[0], FOCUS_AREAS[1]
+RESPONSE = f"""Focus Area 1: **{FIRST}**
+Reasoning: Fits their curiosity.
+
+Focus Area 2: [{SECOND.upper()}]
+Reasoning: Matches their teamwork.
+
+Focus Area 3: Underwater Basket Weaving
+Reasoning: Not a known focus area.
+
+Focus Area 4: {FIRST}
+Reasoning: A repeat."""
+
+EXPECTED = [(FIRST, "Fits their curiosity."), (SECOND, "Matches their teamwork.")]
+
+def test_parse_drops_unknown_and_repeated_areas():
+    assert parse_focus_recommendations(RESPONSE) == EXPECTED
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, 64])
+def test_parser_is_independent_of_chunk_boundaries(chunk_size):
+    parser = FocusRecommendationParser()
+    records = []
+    for start in range(0, len(RESPONSE), chunk_size):
+        records += parser.feed(RESPONSE[start:start + chunk_size])
+    assert records + parser.close() == EXPECTED
+
+def test_parser_emits_each_block_once_its_reasoning_line_ends():
+    parser = FocusRecommendationParser()
+    assert parser.feed(f"Focus Area 1: {FIRST}\nReasoning: Fits") == []
+    assert parser.feed(" well.\nFocus") == [(FIRST, "Fits well.")]
+
+def test_close_flushes_a_block_without_reasoning():
+    parser = FocusRecommendationParser()
+    assert parser.feed(f"Focus Area 1: {FIRST}") == []
+    assert parser.close() == [(FIRST, "")]
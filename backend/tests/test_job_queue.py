@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from utils.job_queue import MemoryJobQueue, SQLiteJobQueue, JobQueueFullError, FAILED, SUCCEEDED
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_queue(request, tmp_path):
+    queues = []
+    def make(**kwargs):
+        if request.param == "memory":
+            queue = MemoryJobQueue(**kwargs)
+        else:
+            queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), **kwargs)
+        queues.append(queue)
+        return queue
+    yield make
+    for queue in queues:
+        queue.close()
+
+async def run_until_finished(queue, job_ids):
+    queue.start()
+    try:
+        for _ in range(200):
+            jobs = [await queue.get(job_id) for job_id in job_ids]
+            if all(job["status"] in (SUCCEEDED, FAILED) for job in jobs):
+                return jobs
+            await asyncio.sleep(0.02)
+        raise AssertionError("Jobs did not finish")
+    finally:
+        await queue.stop()
+
+def test_identical_unfinished_jobs_are_deduplicated(make_queue):
+    async def scenario():
+        queue = make_queue(workers=1)
+        queue.register("echo", lambda user_id, n: asyncio.sleep(0, result=n))
+        first = await queue.submit("echo", "u", {"n": 1}, priority=0)
+        assert (await queue.submit("echo", "u", {"n": 1}, priority=0))["job_id"] == first["job_id"]
+        assert (await queue.submit("echo", "u", {"n": 2}, priority=0))["job_id"] != first["job_id"]
+        assert (await queue.submit("echo", "other", {"n": 1}, priority=0))["job_id"] != first["job_id"]
+        await run_until_finished(queue, [first["job_id"]])
+        # Once finished, the same request starts a new job
+        assert (await queue.submit("echo", "u", {"n": 1}, priority=0))["job_id"] != first["job_id"]
+    asyncio.run(scenario())
+
+def test_jobs_run_in_priority_then_submission_order(make_queue):
+    async def scenario():
+        queue = make_queue(workers=1)
+        order = []
+        async def record(user_id, n):
+            order.append(n)
+            return n
+        queue.register("record", record)
+        jobs = [await queue.submit("record", "u", {"n": n}, priority) for n, priority in ((1, 2), (2, 0), (3, 1), (4, 0))]
+        finished = await run_until_finished(queue, [job["job_id"] for job in jobs])
+        assert order == [2, 4, 3, 1]
+        assert [job["result"] for job in finished] == [1, 2, 3, 4]
+    asyncio.run(scenario())
+
+def test_full_queue_rejects_unless_exempt(make_queue):
+    async def scenario():
+        queue = make_queue(workers=1, max_queued=1)
+        queue.register("echo", lambda user_id, n: asyncio.sleep(0, result=n))
+        await queue.submit("echo", "u", {"n": 1}, priority=0)
+        with pytest.raises(JobQueueFullError):
+            await queue.submit("echo", "u", {"n": 2}, priority=0)
+        await queue.submit("echo", "u", {"n": 3}, priority=0, enforce_limit=False)
+    asyncio.run(scenario())
+
+def test_unexpected_errors_are_not_exposed(make_queue):
+    async def scenario():
+        queue = make_queue(workers=1)
+        async def boom(user_id):
+            raise RuntimeError("connection string with a password")
+        queue.register("boom", boom)
+        job = await queue.submit("boom", "u", {}, priority=0)
+        [finished] = await run_until_finished(queue, [job["job_id"]])
+        assert finished["status"] == FAILED and finished["status_code"] == 500
+        assert "password" not in finished["error"]
+    asyncio.run(scenario())
+
+def test_worker_survives_a_result_it_cannot_store(make_queue):
+    async def scenario():
+        queue = make_queue(workers=1)
+        async def unserializable(user_id):
+            return {1, 2}
+        queue.register("unserializable", unserializable)
+        queue.register("echo", lambda user_id, n: asyncio.sleep(0, result=n))
+        bad = await queue.submit("unserializable", "u", {}, priority=0)
+        good = await queue.submit("echo", "u", {"n": 1}, priority=1)
+        finished = await run_until_finished(queue, [bad["job_id"], good["job_id"]])
+        if isinstance(queue, SQLiteJobQueue):
+            assert finished[0]["status"] == FAILED and finished[0]["status_code"] == 500
+        assert finished[1]["result"] == 1
+    asyncio.run(scenario())
+
+def test_worker_survives_queue_errors(make_queue, monkeypatch):
+    async def scenario():
+        queue = make_queue(workers=1)
+        queue.register("echo", lambda user_id, n: asyncio.sleep(0, result=n))
+        next_job = queue._next_job
+        failures = iter([RuntimeError("database is locked")])
+        async def flaky_next_job():
+            for error in failures:
+                raise error
+            return await next_job()
+        monkeypatch.setattr(queue, "_next_job", flaky_next_job)
+        job = await queue.submit("echo", "u", {"n": 1}, priority=0)
+        [finished] = await run_until_finished(queue, [job["job_id"]])
+        assert finished["result"] == 1
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from utils import model_generations
+from utils.model_generations import generate_llm_response
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Replaces the upstream call with a slow fake that counts how often it runs."""
+    calls = []
+
+    async def fetch(prompt, model, max_tokens):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"answer to {prompt}"
+
+    monkeypatch.setattr(model_generations, "_fetch_completion", fetch)
+    return calls
+
+def test_identical_concurrent_requests_share_one_call(upstream):
+    async def scenario():
+        return await asyncio.gather(*(generate_llm_response("same") for _ in range(5)), generate_llm_response("other"))
+
+    results = asyncio.run(scenario())
+    assert results == ["answer to same"] * 5 + ["answer to other"]
+    assert sorted(upstream) == ["other", "same"]
+    assert model_generations._inflight == {}
+
+def test_cancelled_caller_does_not_cancel_the_others(upstream):
+    async def scenario():
+        first = asyncio.create_task(generate_llm_response("same"))
+        second = asyncio.create_task(generate_llm_response("same"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "answer to same"
+    assert upstream == ["same"]
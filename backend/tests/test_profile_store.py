@@ -0,0 +1,71 @@
+import time
+import pytest
+from utils.profile_store import JSONFileProfileStore, SQLiteProfileStore, VersionConflictError
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteProfileStore(str(tmp_path / "profiles.db"), legacy_file=None)
+    else:
+        store = JSONFileProfileStore(str(tmp_path / "profiles.json"))
+    yield store
+    store.close()
+
+def test_save_and_load(store):
+    store.save("u", {"age": 20})
+    assert store.load("u") == {"age": 20}
+    assert store.load("nobody") is None
+
+def test_save_many_and_delete(store):
+    store.save_many([("a", {"age": 1}), ("b", {"age": 2})])
+    store.delete("a")
+    assert list(store.user_ids()) == ["b"]
+
+def test_sqlite_imports_legacy_file_once(tmp_path):
+    legacy = tmp_path / "user_profiles.json"
+    legacy.write_text('{"old": {"age": 30}}')
+    store = SQLiteProfileStore(str(tmp_path / "profiles.db"), legacy_file=str(legacy))
+    store.save("old", {"age": 31})
+    store.close()
+    store = SQLiteProfileStore(str(tmp_path / "profiles.db"), legacy_file=str(legacy))
+    assert store.load("old") == {"age": 31}
+    store.close()
+
+def test_missing_profile_is_version_zero(store):
+    assert store.load_versioned("nobody") == (None, 0)
+
+def test_save_bumps_version(store):
+    assert store.save("u", {"age": 20}) == 1
+    assert store.save("u", {"age": 21}, expected_version=1) == 2
+    assert store.load_versioned("u") == ({"age": 21}, 2)
+
+def test_stale_version_is_rejected(store):
+    store.save("u", {"age": 20})
+    store.save("u", {"age": 21})
+    with pytest.raises(VersionConflictError):
+        store.save("u", {"age": 99}, expected_version=1)
+    assert store.load("u") == {"age": 21}
+
+def test_expected_version_zero_requires_a_new_profile(store):
+    store.save("u", {"age": 20}, expected_version=0)
+    with pytest.raises(VersionConflictError):
+        store.save("u", {"age": 21}, expected_version=0)
+
+def test_delete_with_stale_version_keeps_the_profile(store):
+    store.save("u", {"age": 20})
+    store.save("u", {"age": 21})
+    with pytest.raises(VersionConflictError):
+        store.delete("u", expected_version=1)
+    assert store.load("u") == {"age": 21}
+    store.delete("u", expected_version=2)
+    assert store.load("u") is None
+
+def test_idle_sessions_by_ttl_and_cap(store):
+    now = time.time()
+    store.save("stale", {"chatbot_state": {"step": 1, "last_active": now - 1000}})
+    store.save("no_session", {"chatbot_state": None})
+    for i in range(3):
+        store.save(f"recent{i}", {"chatbot_state": {"step": 1, "last_active": now - i}})
+    assert store.idle_sessions(now - 100, 10) == ["stale"]
+    assert sorted(store.idle_sessions(now - 100, 2)) == ["recent2", "stale"]
+    assert sorted(store.idle_sessions(None, 2)) == ["recent2", "stale"]
@@ -0,0 +1,41 @@
+import asyncio
+import json
+import pytest
+import rescore_profiles
+from utils.constants import FOCUS_AREAS
+from utils.profile_store import SQLiteProfileStore
+
+def write_results(job, contents):
+    with open(job.results_path, "w") as f:
+        for user_id, content in contents.items():
+            f.write(json.dumps({"custom_id": user_id, "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}}}) + "\n")
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteProfileStore(str(tmp_path / "profiles.db"), legacy_file=None)
+    store.save("kept", {"interests": "art"})
+    store.save("changed", {"interests": "music"})
+    store.save("unassessed", {"age": 20})
+    yield store
+    store.close()
+
+def test_merge_skips_profiles_changed_since_prepare(tmp_path, store):
+    job = rescore_profiles.Job(str(tmp_path / "job"))
+    assert rescore_profiles.prepare(job, store) == 2
+    assert job.versions() == {"kept": 1, "changed": 1}
+
+    store.save("changed", {"interests": "sport"})  # The user retook the assessment meanwhile
+    content = f"Focus Area 1: {FOCUS_AREAS[0]}\nReasoning: Fits."
+    write_results(job, {"kept": content, "changed": content})
+
+    assert rescore_profiles.merge(job, store) == 1
+    assert store.load("kept")["focus_recommendations"] == [{"focus_area": FOCUS_AREAS[0], "reasoning": "Fits."}]
+    assert store.load("changed") == {"interests": "sport"}
+    with open(job.merged_path) as f:
+        assert f.read().split() == ["kept"]
+    assert job.state["skipped"] == 1
+
+def test_refuses_the_json_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(rescore_profiles, "PROFILE_STORE_BACKEND", "json")
+    with pytest.raises(SystemExit):
+        asyncio.run(rescore_profiles.run(rescore_profiles.Job(str(tmp_path / "job")), "local", 1, 1))
@@ -0,0 +1,71 @@
+import asyncio
+import time
+import pytest
+from utils.resilience import (CircuitBreaker, CircuitOpenError, LLMRateLimitError, TokenBucket, LLM_BACKOFF_MAX,
+                              backoff_delay, exceeds_backoff_max)
+
+def test_backoff_delay_is_capped():
+    assert backoff_delay(0, retry_after=LLM_BACKOFF_MAX * 10) == LLM_BACKOFF_MAX
+    assert backoff_delay(10) <= LLM_BACKOFF_MAX
+    assert exceeds_backoff_max(LLM_BACKOFF_MAX + 1)
+    assert not exceeds_backoff_max(None)
+
+def test_backoff_delay_honours_short_retry_after():
+    assert backoff_delay(0, retry_after=LLM_BACKOFF_MAX / 2) >= LLM_BACKOFF_MAX / 2
+
+def test_token_bucket_allows_burst_then_fails_fast():
+    async def scenario():
+        bucket = TokenBucket(rate=1.0, capacity=3)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire(max_wait=0.0)
+        assert time.monotonic() - started < 0.5
+        with pytest.raises(LLMRateLimitError) as error:
+            await bucket.acquire(max_wait=0.1)
+        assert error.value.retry_after == pytest.approx(1.0, abs=0.1)
+    asyncio.run(scenario())
+
+def test_token_bucket_waits_for_refill():
+    async def scenario():
+        bucket = TokenBucket(rate=20.0, capacity=1)
+        await bucket.acquire()
+        started = time.monotonic()
+        await bucket.acquire(max_wait=1.0)
+        assert time.monotonic() - started >= 0.03
+    asyncio.run(scenario())
+
+def test_circuit_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert 0 < error.value.retry_after <= 60
+
+def test_circuit_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_circuit_breaker_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # The trial is still in flight
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_circuit_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
@@ -0,0 +1,39 @@
+import sqlite3
+import time
+from utils.response_cache import ResponseCache, make_cache_key
+
+def test_key_depends_on_every_input():
+    keys = {make_cache_key("p", "m", 10), make_cache_key("p", "m", 11), make_cache_key("p", "n", 10), make_cache_key("q", "m", 10)}
+    assert len(keys) == 4
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = ResponseCache(path=None, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a is now the most recently used
+    cache.set("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), ttl=0.05)
+    cache.set("a", "1")
+    assert cache.get("a") == "1"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+def test_memory_misses_fall_through_to_disk(tmp_path):
+    ResponseCache(path=str(tmp_path / "cache.db")).set("a", "1")
+    assert ResponseCache(path=str(tmp_path / "cache.db")).get("a") == "1"
+
+def test_locked_database_is_not_an_error(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path)
+    other = sqlite3.connect(path, timeout=0)
+    other.execute("BEGIN IMMEDIATE")  # Another worker holds the write lock
+    other.execute("INSERT INTO llm_cache VALUES ('x', 'y', 0)")
+    started = time.monotonic()
+    cache.set("a", "1")
+    assert time.monotonic() - started < 5
+    assert cache.get("a") == "1"  # Still served from memory
+    other.rollback()
+    other.close()
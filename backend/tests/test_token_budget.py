@@ -0,0 +1,32 @@
+from utils import token_budget
+from utils.token_budget import TRUNCATION_MARKER, count_tokens, fit_fields, truncate_to_tokens
+
+def test_truncate_marks_the_cut():
+    text = "word " * 200
+    truncated = truncate_to_tokens(text, 20)
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert count_tokens(truncated) <= 20
+    assert truncate_to_tokens("short", 20) == "short"
+
+def test_short_fields_are_kept_whole():
+    fields = {"age": "34", "location": "Lisbon"}
+    assert fit_fields(fields) == fields
+
+def test_long_field_is_capped(monkeypatch):
+    monkeypatch.setattr(token_budget, "PROMPT_FIELD_MAX_TOKENS", 10)
+    fitted = fit_fields({"age": "34", "notes": "word " * 200})
+    assert fitted["age"] == "34"
+    assert fitted["notes"].endswith(TRUNCATION_MARKER)
+    assert count_tokens(fitted["notes"]) <= 10
+
+def test_field_caps_override_the_default():
+    fitted = fit_fields({"history": "word " * 200}, field_caps={"history": 15})
+    assert count_tokens(fitted["history"]) <= 15
+
+def test_fields_share_what_is_left_of_the_budget(monkeypatch):
+    monkeypatch.setattr(token_budget, "PROMPT_MAX_TOKENS", 100)
+    fields = {"age": "34", "notes": "word " * 200, "goals": "word " * 200}
+    fitted = fit_fields(fields, reserved_tokens=40)
+    assert fitted["age"] == "34"
+    assert sum(count_tokens(value) for value in fitted.values()) <= 60
+    assert abs(count_tokens(fitted["notes"]) - count_tokens(fitted["goals"])) <= 1
@@ -0,0 +1,131 @@
+import abc
+import asyncio
+import json
+import os
+from typing import Set
+from utils.metrics import logger
+from utils.model_generations import generate_llm_response, get_llm_client
+from utils.resilience import LLMError
+
+class BatchBackend(abc.ABC):
+    """Runs a JSONL file of chat completion requests in the OpenAI Batch API format.
+
+    Each input line is {"custom_id", "method", "url", "body"}; each output line is
+    {"custom_id", "response": {"status_code", "body"}, "error"}.
+    """
+    name = ""
+
+    @abc.abstractmethod
+    async def submit(self, input_path: str) -> str:
+        """Starts processing the file and returns a batch id."""
+
+    @abc.abstractmethod
+    async def status(self, batch_id: str) -> str:
+        """One of "in_progress", "completed" or "failed"."""
+
+    @abc.abstractmethod
+    async def download(self, batch_id: str, output_path: str):
+        """Writes the results of a completed batch to output_path."""
+
+class LocalBatchBackend(BatchBackend):
+    """Processes the batch in this process through the regular LLM layer.
+
+    Results are appended to the output file as they complete, and requests that
+    already have a successful result there are skipped, so an interrupted run
+    resumes where it stopped.
+    """
+    name = "local"
+
+    def __init__(self, concurrency: int = 8):
+        self.concurrency = concurrency
+
+    async def submit(self, input_path: str) -> str:
+        # The work happens in download(), so the id only needs to locate the input again after a restart
+        return "local:" + os.path.abspath(input_path)
+
+    async def status(self, batch_id: str) -> str:
+        return "completed" if os.path.exists(batch_id[len("local:"):]) else "failed"
+
+    async def download(self, batch_id: str, output_path: str):
+        input_path = batch_id[len("local:"):]
+        done = _completed_ids(output_path)
+        _terminate_last_line(output_path)
+        with open(input_path) as f:
+            pending = [json.loads(line) for line in f if line.strip()]
+        pending = [request for request in pending if request["custom_id"] not in done]
+        logger.info("Local batch %s: %d requests to run, %d already done.", batch_id, len(pending), len(done))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        write_lock = asyncio.Lock()
+        with open(output_path, "a") as out:
+            async def run(request):
+                body = request["body"]
+                async with semaphore:
+                    try:
+                        content = await generate_llm_response(body["messages"][0]["content"], model=body["model"], max_tokens=body["max_tokens"])
+                        result = {"custom_id": request["custom_id"], "error": None, "response": {
+                            "status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}}}
+                    except LLMError as e:
+                        result = {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+                async with write_lock:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+
+            await asyncio.gather(*(run(request) for request in pending))
+
+class OpenAIBatchBackend(BatchBackend):
+    """Submits the file to the OpenAI Batch API (discounted, completes within 24h)."""
+    name = "openai"
+
+    async def submit(self, input_path: str) -> str:
+        client = get_llm_client()
+        with open(input_path, "rb") as f:
+            uploaded = await client.files.create(file=f, purpose="batch")
+        batch = await client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions", completion_window="24h")
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        batch = await get_llm_client().batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return "completed"
+        if batch.status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    async def download(self, batch_id: str, output_path: str):
+        client = get_llm_client()
+        batch = await client.batches.retrieve(batch_id)
+        content = await client.files.content(batch.output_file_id)
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content.content)
+        os.replace(tmp_path, output_path)
+
+def _terminate_last_line(path: str):
+    """Makes sure appended results start on a fresh line even if the last run died mid-write."""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+def _completed_ids(output_path: str) -> Set[str]:
+    """custom_ids that already have a successful result; failed ones are retried on the next run."""
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue  # A line torn by a crash mid-write; that request simply runs again
+                if result.get("response"):
+                    done.add(result["custom_id"])
+    return done
+
+def create_batch_backend(name: str, concurrency: int = 8) -> BatchBackend:
+    if name == "local":
+        return LocalBatchBackend(concurrency)
+    if name == "openai":
+        return OpenAIBatchBackend()
+    raise ValueError(f"Unknown batch backend: {name}")
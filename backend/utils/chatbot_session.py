@@ -0,0 +1,97 @@
+import os
+import time
+from enum import IntEnum
+from typing import List, Optional
+from utils.constants import PERSONALITY_QUESTIONS
+from utils.metrics import logger
+from utils.profile_store import ProfileStore, VersionConflictError
+
+# --- Session Configuration ---
+CHATBOT_MAX_ANSWER_CHARS = int(os.getenv("CHATBOT_MAX_ANSWER_CHARS", "1000"))  # Longer answers are truncated
+CHATBOT_SESSION_TTL = float(os.getenv("CHATBOT_SESSION_TTL", "86400"))  # Seconds of inactivity before a session is dropped
+CHATBOT_MAX_SESSIONS = int(os.getenv("CHATBOT_MAX_SESSIONS", "10000"))  # Least recently active sessions beyond this are dropped
+CHATBOT_SESSION_SWEEP_INTERVAL = float(os.getenv("CHATBOT_SESSION_SWEEP_INTERVAL", "600"))  # 0 disables the sweep
+
+class Step(IntEnum):
+    INITIAL = 0
+    ASK_AGE = 1
+    ASK_PASSION = 2
+    PERSONALITY_QUESTIONS = 3
+
+# Profiles written before sessions were typed store the step by name and answers as "User: ..." lines
+LEGACY_STEPS = {step.name.lower(): step for step in Step}
+LEGACY_ANSWER_PREFIX = "User: "
+
+class ChatbotSession:
+    """Progress through the assessment: the current step and the personality answers so far.
+
+    At most one answer per personality question is kept, each capped at
+    CHATBOT_MAX_ANSWER_CHARS, so a session's size is bounded whatever the user sends.
+    """
+    __slots__ = ("step", "question_index", "answers", "last_active")
+
+    def __init__(self, step: Step = Step.INITIAL, question_index: int = 0, answers: Optional[List[str]] = None, last_active: Optional[float] = None):
+        self.step = step
+        self.question_index = question_index
+        self.answers = answers if answers is not None else []
+        self.last_active = last_active if last_active is not None else time.time()
+
+    def record_answer(self, answer: str):
+        if len(self.answers) < len(PERSONALITY_QUESTIONS):
+            self.answers.append(answer[:CHATBOT_MAX_ANSWER_CHARS])
+        self.question_index += 1
+
+    def conversation_history(self) -> str:
+        """The answers in the transcript format the analysis prompts expect."""
+        return "\n".join(LEGACY_ANSWER_PREFIX + answer for answer in self.answers)
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return CHATBOT_SESSION_TTL > 0 and (now or time.time()) - self.last_active > CHATBOT_SESSION_TTL
+
+    def to_dict(self) -> dict:
+        return {"step": int(self.step), "question_index": self.question_index, "answers": self.answers, "last_active": self.last_active}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["ChatbotSession"]:
+        if not data:
+            return None
+        step = data.get("step", Step.INITIAL)
+        step = LEGACY_STEPS[step] if isinstance(step, str) else Step(step)
+        answers = data.get("answers")
+        if answers is None:
+            answers = [response.removeprefix(LEGACY_ANSWER_PREFIX) for response in data.get("responses", [])]
+        # Legacy sessions carry no timestamp; treat them as active now rather than expiring them on sight
+        return cls(step, data.get("question_index", 0), answers[:len(PERSONALITY_QUESTIONS)], data.get("last_active"))
+
+def is_session_stub(profile_data: dict) -> bool:
+    """True for a profile that holds nothing but a session, i.e. a visitor who never answered anything."""
+    return all(value in (None, "", 0, False) for key, value in profile_data.items() if key != "chatbot_state")
+
+def sweep_idle_sessions(store: ProfileStore, now: Optional[float] = None) -> int:
+    """Drops sessions idle for longer than CHATBOT_SESSION_TTL, then the least recently
+    active ones beyond CHATBOT_MAX_SESSIONS.
+
+    The rest of the profile is kept; profiles that were only an empty session are
+    deleted. Returns the number of sessions dropped.
+    """
+    now = now or time.time()
+    cutoff = now - CHATBOT_SESSION_TTL if CHATBOT_SESSION_TTL > 0 else None
+    dropped = 0
+    for user_id in store.idle_sessions(cutoff, CHATBOT_MAX_SESSIONS):
+        profile_data, version = store.load_versioned(user_id)
+        if not profile_data or not profile_data.get("chatbot_state"):
+            continue
+        try:
+            if is_session_stub(profile_data):
+                store.delete(user_id, expected_version=version)
+            else:
+                store.save(user_id, dict(profile_data, chatbot_state=None), expected_version=version)
+            dropped += 1
+        except VersionConflictError:
+            continue  # The user came back mid-sweep; leave their session alone
+    if dropped:
+        logger.info("Dropped %d idle chatbot sessions.", dropped)
+    return dropped
@@ -19,6 +19,28 @@ FOCUS_AREAS = [
     "Business & Entrepreneurship"
 ]
 
+# Short descriptions of each focus area, used to build the local ranking index in utils/focus_ranking.py
+FOCUS_AREA_KEYWORDS = {
+    "Digital Transformation & E-commerce": "online business, digital marketing, shopping, brands, social media, content, websites, customers",
+    "Software Development & Cloud Computing": "programming, coding, software, apps, computers, building tools, cloud, servers, technology",
+    "Cybersecurity & Data Privacy": "security, hacking, protecting systems, privacy, puzzles, investigation, risk, networks",
+    "Artificial Intelligence & Machine Learning": "AI, machine learning, data, algorithms, research, mathematics, automation, innovation",
+    "Medicine & Healthcare": "helping people, health, caring, patients, biology, doctors, nursing, wellbeing, empathy",
+    "Sports & Professional Athletics": "sports, fitness, competition, training, teamwork, exercise, coaching, physical activity",
+    "Aerospace & Aviation": "flying, planes, space, engineering, travel, physics, precision, adventure",
+    "Agriculture & Agribusiness": "farming, nature, food, plants, animals, outdoors, sustainability, land",
+    "Finance & Financial Services": "money, investing, wealth, numbers, markets, banking, economics, analysis",
+    "Renewable Energy": "environment, climate, sustainability, solar, wind, green technology, engineering",
+    "Biotechnology & Genomics": "biology, genetics, laboratory, research, science, medicine, chemistry, discovery",
+    "Robotics & Automation": "robots, machines, building things, engineering, electronics, automation, hands-on",
+    "Data Analytics & Business Intelligence": "data, analysis, statistics, numbers, patterns, reports, insights, spreadsheets",
+    "Internet of Things & Embedded Systems": "electronics, devices, sensors, hardware, gadgets, smart homes, tinkering",
+    "Blockchain & Web3 Technologies": "crypto, blockchain, decentralization, finance, technology, smart contracts",
+    "Civil Engineering": "construction, infrastructure, bridges, roads, planning, structures, cities, building",
+    "Architecture": "design, buildings, drawing, creativity, art, spaces, aesthetics, planning",
+    "Business & Entrepreneurship": "business, leadership, startups, management, sales, risk taking, wealth, independence, strategy"
+}
+
 CAREER_RECOMMENDATIONS = {
     "Digital Transformation & E-commerce": ["Digital Marketing Manager", "E-commerce Specialist", "UX/UI Designer", "Content Marketing Strategist", "SEO Specialist", "Social Media Manager", "Web Analyst"],
     "Software Development & Cloud Computing": ["Software Engineer", "Web Developer (Front-End, Back-End, Full-Stack)", "Cloud Architect", "DevOps Engineer", "Mobile App Developer (iOS, Android)", "Database Administrator"],
@@ -0,0 +1,121 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from utils.constants import FOCUS_AREAS, FOCUS_AREA_KEYWORDS, CAREER_RECOMMENDATIONS
+
+# --- Ranking Configuration ---
+FOCUS_PRERANK_TOP_K = int(os.getenv("FOCUS_PRERANK_TOP_K", "8"))  # 0 sends every focus area to the LLM
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be based by for from has have i in is it its my of on or our that the their them they this to "
+    "user user's with you your was were will would do does like more most very also not but so can various etc".split()
+)
+_PROFILE_FIELDS = ("passion", "interests", "personality_traits", "skills", "values", "career_goals",
+                   "educational_background", "professional_experience")
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOP_WORDS and len(token) > 1]
+
+def profile_text(profile: dict) -> str:
+    """Concatenates the free-text fields of a learner profile."""
+    return " ".join(str(profile[field]) for field in _PROFILE_FIELDS if profile.get(field) and profile[field] != 'Not specified')
+
+class TfidfIndex:
+    """A TF-IDF vector index over a fixed set of labelled documents.
+
+    The vectors are L2-normalised, so cosine similarity against every document
+    is a single matrix-vector product.
+    """
+
+    def __init__(self, documents: Dict[str, str]):
+        self.labels = list(documents)
+        tokenized = [tokenize(documents[label]) for label in self.labels]
+        self.vocabulary = {term: i for i, term in enumerate(sorted({t for tokens in tokenized for t in tokens}))}
+        document_frequency = Counter(term for tokens in tokenized for term in set(tokens))
+        n_documents = len(self.labels)
+        self.idf = np.array([math.log((1 + n_documents) / (1 + document_frequency[term])) + 1.0 for term in self.vocabulary])
+        self.matrix = np.vstack([self._vectorize(tokens) for tokens in tokenized]) if tokenized else np.zeros((0, len(self.vocabulary)))
+
+    def _vectorize(self, tokens: List[str]) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary))
+        for term, count in Counter(tokens).items():
+            index = self.vocabulary.get(term)
+            if index is not None:
+                vector[index] = count
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def matching_terms(self, text: str, label: str) -> List[str]:
+        """Query terms that also occur in the given document, highest weight first."""
+        row = self.matrix[self.labels.index(label)]
+        terms = {term for term in tokenize(text) if term in self.vocabulary and row[self.vocabulary[term]] > 0}
+        return sorted(terms, key=lambda term: -row[self.vocabulary[term]])
+
+    def rank(self, text: str, top_k: Optional[int] = None, labels: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Returns (label, cosine similarity) pairs, best first, optionally restricted to `labels`."""
+        scores = self.matrix @ self._vectorize(tokenize(text))
+        order = np.argsort(-scores, kind="stable")
+        ranked = [(self.labels[i], float(scores[i])) for i in order]
+        if labels is not None:
+            allowed = set(labels)
+            ranked = [(label, score) for label, score in ranked if label in allowed]
+        return ranked[:top_k] if top_k else ranked
+
+_focus_index = None
+_career_index = None
+
+def get_focus_index() -> TfidfIndex:
+    """Index over focus areas, each described by its name, keywords and careers."""
+    global _focus_index
+    if _focus_index is None:
+        _focus_index = TfidfIndex({
+            area: " ".join([area, FOCUS_AREA_KEYWORDS.get(area, "")] + CAREER_RECOMMENDATIONS.get(area, []))
+            for area in FOCUS_AREAS
+        })
+    return _focus_index
+
+def get_career_index() -> TfidfIndex:
+    """Index over careers, each described by its name and the focus areas it belongs to."""
+    global _career_index
+    if _career_index is None:
+        documents = {}
+        for area, careers in CAREER_RECOMMENDATIONS.items():
+            for career in careers:
+                documents[career] = " ".join(filter(None, [documents.get(career, career), area, FOCUS_AREA_KEYWORDS.get(area, "")]))
+        _career_index = TfidfIndex(documents)
+    return _career_index
+
+def rank_focus_areas(profile: dict, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Scores every focus area against the learner profile."""
+    return get_focus_index().rank(profile_text(profile), top_k=top_k)
+
+def rank_careers(profile: dict, focus_area: Optional[str] = None, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Scores careers against the learner profile, optionally only those within one focus area."""
+    labels = CAREER_RECOMMENDATIONS.get(focus_area) if focus_area else None
+    return get_career_index().rank(profile_text(profile), top_k=top_k, labels=labels)
+
+def candidate_focus_areas(profile: dict, top_k: int = FOCUS_PRERANK_TOP_K) -> List[str]:
+    """The focus areas worth offering to the LLM; all of them if the profile has no usable text."""
+    ranked = rank_focus_areas(profile)
+    if not top_k or not ranked or ranked[0][1] == 0:
+        return list(FOCUS_AREAS)
+    return [area for area, _ in ranked[:top_k]]
+
+def local_focus_recommendations(profile: dict, top_k: int = 3) -> List[Tuple[str, str]]:
+    """LLM-free (focus_area, reasoning) recommendations, used when the LLM is unavailable."""
+    index = get_focus_index()
+    text = profile_text(profile)
+    recommendations = []
+    for area, score in index.rank(text, top_k=top_k):
+        terms = index.matching_terms(text, area)[:4]
+        if score > 0 and terms:
+            reasoning = f"Your profile mentions {', '.join(terms)}, which closely matches this field."
+        else:
+            reasoning = "A broadly relevant field to explore while we learn more about you."
+        recommendations.append((area, reasoning))
+    return recommendations
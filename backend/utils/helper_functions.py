@@ -1,23 +1,65 @@
-def parse_llm_list_response(llm_response: str):
-    items = []
-    for line in llm_response.split('\n'):
+import json
+from typing import Iterable, List, Optional, Tuple
+from utils.constants import FOCUS_AREAS
+
+class FocusRecommendationParser:
+    """Single-pass, incremental parser for the "Focus Area N: ... / Reasoning: ..." LLM output.
+
+    Feed it text chunks as they arrive; each call returns the (focus_area, reasoning)
+    records completed so far. Names are matched against the known focus areas
+    (case-insensitively) and anything unknown or repeated is dropped.
+    """
+
+    def __init__(self, focus_areas: Iterable[str] = FOCUS_AREAS):
+        self._known = {area.lower(): area for area in focus_areas}
+        self._buffer = ""
+        self._seen = set()
+        self._focus_area: Optional[str] = None
+        self._reasoning: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self._buffer += chunk
+        records = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            records.extend(self._parse_line(line))
+        return records
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flushes the trailing partial line and any block still open."""
+        records = self._parse_line(self._buffer)
+        self._buffer = ""
+        records.extend(self._finish_block())
+        return records
+
+    def _parse_line(self, line: str) -> List[Tuple[str, str]]:
+        line = line.strip().strip("*").strip()
         if line.startswith("Focus Area"):
             parts = line.split(":", 1)
+            records = self._finish_block()
             if len(parts) == 2:
-                item = parts[1].strip()
-                items.append(item)
-    return items
-
-def parse_llm_reasoning_response(llm_response: str):
-    reasoning = {}
-    current_focus_area = None
-    for line in llm_response.split('\n'):
-        if line.startswith("Focus Area"):
+                self._focus_area = self._known.get(parts[1].strip().strip("*[]").strip().lower())
+            return records
+        if line.startswith("Reasoning") and self._focus_area:
             parts = line.split(":", 1)
             if len(parts) == 2:
-                current_focus_area = parts[1].strip()
-        elif line.startswith("Reasoning"):
-            parts = line.split(":", 1)
-            if len(parts) == 2 and current_focus_area:
-                reasoning[current_focus_area] = parts[1].strip()
-    return reasoning
\ No newline at end of file
+                self._reasoning = parts[1].strip().strip("*").strip()
+                return self._finish_block()
+        return []
+
+    def _finish_block(self) -> List[Tuple[str, str]]:
+        focus_area, reasoning = self._focus_area, self._reasoning
+        self._focus_area = self._reasoning = None
+        if focus_area is None or focus_area in self._seen:
+            return []
+        self._seen.add(focus_area)
+        return [(focus_area, reasoning or "")]
+
+def parse_focus_recommendations(llm_response: str) -> List[Tuple[str, str]]:
+    """Parses a complete focus recommendation response into (focus_area, reasoning) records."""
+    parser = FocusRecommendationParser()
+    return parser.feed(llm_response) + parser.close()
+
+def format_sse(event: str, data) -> str:
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
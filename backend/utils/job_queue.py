@@ -0,0 +1,269 @@
+import abc
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from utils.metrics import logger, JOBS, JOB_QUEUE_WAIT
+
+# --- Queue Configuration ---
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory")  # "sqlite" shares jobs between uvicorn workers
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # Jobs run at once, per process
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "1000"))  # Queued jobs beyond this are rejected
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "300"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))  # Seconds finished jobs stay pollable
+JOB_POLL_INTERVAL = 0.2  # How often idle sqlite workers look for new jobs
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+JOB_FAILED_MESSAGE = "The job could not be completed. Please try again shortly."
+
+Handler = Callable[..., Awaitable[Any]]
+
+class JobQueueFullError(Exception):
+    """Raised by submit() when JOB_QUEUE_MAX jobs are already waiting."""
+
+def dedup_key(kind: str, user_id: str, params: dict) -> str:
+    return hashlib.sha256(json.dumps([kind, user_id, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+def job_view(job: dict) -> dict:
+    """The public status of a job, without its params or result."""
+    return {key: job[key] for key in ("job_id", "kind", "user_id", "status", "priority", "error", "created_at", "started_at", "finished_at")}
+
+class JobQueue(abc.ABC):
+    """Runs registered async handlers as background jobs on a bounded pool of workers.
+
+    Jobs run lowest priority number first, in submission order within a priority.
+    Submitting a job with the same kind, user and params as one still queued or
+    running returns that job instead of a new one. Handlers are called as
+    handler(user_id, **params) and return a JSON-serializable result; an exception
+    with a status_code (HTTPException, LLMError) fails the job with that code.
+    Only an HTTPException's detail is stored as the job's error; anything else is
+    logged and reported with a generic message.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.handlers: Dict[str, Handler] = {}
+        self._tasks = []
+
+    def register(self, kind: str, handler: Handler):
+        self.handlers[kind] = handler
+
+    @abc.abstractmethod
+    async def submit(self, kind: str, user_id: str, params: dict, priority: int, enforce_limit: bool = True) -> dict:
+        """Queues a job (or finds the identical unfinished one) and returns it."""
+
+    @abc.abstractmethod
+    async def get(self, job_id: str) -> Optional[dict]:
+        """The job including its result, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    async def _next_job(self) -> Tuple[str, str, str, dict, float]:
+        """Waits for and claims the next job: (job_id, kind, user_id, params, created_at)."""
+
+    @abc.abstractmethod
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None, status_code: Optional[int] = None):
+        pass
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        """Runs jobs until cancelled; a failure in one job, or in the queue itself, never ends the worker."""
+        while True:
+            try:
+                await self._run_next_job()
+            except Exception:
+                logger.exception("Job worker error; continuing.")
+                await asyncio.sleep(JOB_POLL_INTERVAL)  # Don't spin if the queue itself keeps failing
+
+    async def _run_next_job(self):
+        job_id, kind, user_id, params, created_at = await self._next_job()
+        JOB_QUEUE_WAIT.observe(time.time() - created_at, kind=kind)
+        try:
+            result = await asyncio.wait_for(self.handlers[kind](user_id, **params), JOB_TIMEOUT)
+        except asyncio.TimeoutError:
+            outcome = {"status": FAILED, "error": f"The job did not finish within {JOB_TIMEOUT:.0f}s.", "status_code": 504}
+            JOBS.inc(kind=kind, outcome="timeout")
+        except Exception as e:
+            status_code = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None)
+            if status_code >= 500 or not detail:
+                logger.warning("Job %s (%s for user %s) failed: %s", job_id, kind, user_id, e)
+            # Other exception messages can carry internals or upstream responses, so clients get a generic one
+            outcome = {"status": FAILED, "error": str(detail) if detail else JOB_FAILED_MESSAGE, "status_code": status_code}
+            JOBS.inc(kind=kind, outcome="failed")
+        else:
+            outcome = {"status": SUCCEEDED, "result": result}
+            JOBS.inc(kind=kind, outcome="succeeded")
+
+        try:
+            await self._finish(job_id, **outcome)
+        except Exception:
+            # e.g. a result that is not JSON-serializable; the job must not be left running forever
+            logger.exception("Could not record the outcome of job %s (%s for user %s).", job_id, kind, user_id)
+            await self._finish(job_id, FAILED, error=JOB_FAILED_MESSAGE, status_code=500)
+
+    def close(self):
+        pass
+
+class MemoryJobQueue(JobQueue):
+    """Keeps jobs in this process. Polls must reach the worker that accepted the job."""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX):
+        super().__init__(workers, max_queued)
+        self._jobs: Dict[str, dict] = {}
+        self._unfinished: Dict[str, str] = {}  # dedup key -> job id
+        self._finished = deque()  # (finished_at, job_id), oldest first, for expiry
+        self._queue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+
+    async def submit(self, kind: str, user_id: str, params: dict, priority: int, enforce_limit: bool = True) -> dict:
+        key = dedup_key(kind, user_id, params)
+        if key in self._unfinished:
+            return self._jobs[self._unfinished[key]]
+        self._expire()
+        if enforce_limit and self._queue.qsize() >= self.max_queued:
+            raise JobQueueFullError(f"{self._queue.qsize()} jobs are already queued.")
+
+        job = {"job_id": uuid.uuid4().hex, "kind": kind, "user_id": user_id, "params": params, "priority": priority,
+               "status": QUEUED, "result": None, "error": None, "status_code": None, "dedup_key": key,
+               "created_at": time.time(), "started_at": None, "finished_at": None}
+        self._jobs[job["job_id"]] = job
+        self._unfinished[key] = job["job_id"]
+        self._queue.put_nowait((priority, next(self._sequence), job["job_id"]))
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def _next_job(self) -> Tuple[str, str, str, dict, float]:
+        _, _, job_id = await self._queue.get()
+        job = self._jobs[job_id]
+        job["status"], job["started_at"] = RUNNING, time.time()
+        return job_id, job["kind"], job["user_id"], job["params"], job["created_at"]
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None, status_code: Optional[int] = None):
+        job = self._jobs[job_id]
+        job.update(status=status, result=result, error=error, status_code=status_code, finished_at=time.time())
+        self._unfinished.pop(job["dedup_key"], None)
+        self._finished.append((job["finished_at"], job_id))
+
+    def _expire(self):
+        cutoff = time.time() - JOB_RESULT_TTL
+        while self._finished and self._finished[0][0] < cutoff:
+            self._jobs.pop(self._finished.popleft()[1], None)
+
+class SQLiteJobQueue(JobQueue):
+    """Keeps jobs in a SQLite table, so every uvicorn worker can accept, run and report any job.
+
+    A job left running by a process that died is claimed again once it has been
+    running for twice JOB_TIMEOUT. Database calls run in a worker thread, off the
+    event loop.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_MAX):
+        super().__init__(workers, max_queued)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT NOT NULL, params TEXT NOT NULL, "
+                         "priority INTEGER NOT NULL, status TEXT NOT NULL, result TEXT, error TEXT, status_code INTEGER, dedup_key TEXT NOT NULL, "
+                         "created_at REAL NOT NULL, started_at REAL, finished_at REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_by_priority ON jobs (status, priority, created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_by_dedup_key ON jobs (dedup_key, status)")
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    async def submit(self, kind: str, user_id: str, params: dict, priority: int, enforce_limit: bool = True) -> dict:
+        return await asyncio.to_thread(self._submit, kind, user_id, params, priority, enforce_limit)
+
+    def _submit(self, kind: str, user_id: str, params: dict, priority: int, enforce_limit: bool) -> dict:
+        key = dedup_key(kind, user_id, params)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT * FROM jobs WHERE dedup_key = ? AND status IN (?, ?)", (key, QUEUED, RUNNING)).fetchone()
+                if row is not None:
+                    self._db.execute("COMMIT")
+                    return self._decode(row)
+                self._db.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (SUCCEEDED, FAILED, now - JOB_RESULT_TTL))
+                queued = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+                if enforce_limit and queued >= self.max_queued:
+                    raise JobQueueFullError(f"{queued} jobs are already queued.")
+                job_id = uuid.uuid4().hex
+                self._db.execute("INSERT INTO jobs (job_id, kind, user_id, params, priority, status, dedup_key, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (job_id, kind, user_id, json.dumps(params), priority, QUEUED, key, now))
+                row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self._decode(row)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ? AND (finished_at IS NULL OR finished_at >= ?)",
+                                   (job_id, time.time() - JOB_RESULT_TTL)).fetchone()
+        return self._decode(row) if row else None
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE job_id = (SELECT job_id FROM jobs WHERE status = ? OR (status = ? AND started_at < ?) "
+                "ORDER BY priority, created_at LIMIT 1) RETURNING job_id, kind, user_id, params, created_at",
+                (RUNNING, now, QUEUED, RUNNING, now - 2 * JOB_TIMEOUT)).fetchone()
+
+    async def _next_job(self) -> Tuple[str, str, str, dict, float]:
+        while True:
+            row = await asyncio.to_thread(self._claim)
+            if row is not None:
+                return row["job_id"], row["kind"], row["user_id"], json.loads(row["params"]), row["created_at"]
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None, status_code: Optional[int] = None):
+        await asyncio.to_thread(self._update_finished, job_id, status, json.dumps(result) if result is not None else None, error, status_code)
+
+    def _update_finished(self, job_id: str, status: str, result: Optional[str], error: Optional[str], status_code: Optional[int]):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, finished_at = ? WHERE job_id = ?",
+                             (status, result, error, status_code, time.time(), job_id))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    """Builds the configured job queue backend."""
+    if backend == "memory":
+        return MemoryJobQueue()
+    if backend == "sqlite":
+        return SQLiteJobQueue()
+    raise ValueError(f"Unknown job queue backend: {backend}")
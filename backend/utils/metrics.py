@@ -0,0 +1,124 @@
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# --- Logging Configuration ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # Fraction of hot-path debug logs that are emitted
+
+logger = logging.getLogger("careercraft")
+
+def log_sampled(level: int, message: str, *args):
+    """Logs a hot-path message for only a LOG_SAMPLE_RATE fraction of calls."""
+    if logger.isEnabledFor(level) and random.random() < LOG_SAMPLE_RATE:
+        logger.log(level, message, *args)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # per-bucket counts, then +Inf count, then sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    bucket_label = 'le="' + le + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, bucket_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+# --- Metrics ---
+HTTP_REQUEST_DURATION = Histogram("careercraft_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+CHATBOT_STEP_DURATION = Histogram("careercraft_chatbot_step_duration_seconds", "Latency of one chatbot state machine step.", ("step",))
+LLM_REQUESTS = Counter("careercraft_llm_requests_total", "Upstream LLM calls by outcome.", ("model", "outcome"))
+LLM_REQUEST_DURATION = Histogram("careercraft_llm_request_duration_seconds", "Upstream LLM call latency, including retries.", ("model",))
+LLM_TOKENS = Counter("careercraft_llm_tokens_total", "LLM tokens used.", ("model", "kind"))
+LLM_CACHE_LOOKUPS = Counter("careercraft_llm_cache_lookups_total", "Response cache lookups.", ("result",))
+LLM_COALESCED_REQUESTS = Counter("careercraft_llm_coalesced_requests_total", "Requests that joined an identical in-flight LLM call.")
+PROFILE_WRITE_DURATION = Histogram("careercraft_profile_write_duration_seconds", "Profile store write latency.", ("backend",),
+                                   buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+JOBS = Counter("careercraft_jobs_total", "Background jobs by kind and outcome.", ("kind", "outcome"))
+JOB_QUEUE_WAIT = Histogram("careercraft_job_queue_wait_seconds", "Time background jobs spent queued before a worker picked them up.", ("kind",))
+
+REGISTRY = (HTTP_REQUEST_DURATION, CHATBOT_STEP_DURATION, LLM_REQUESTS, LLM_REQUEST_DURATION, LLM_TOKENS,
+            LLM_CACHE_LOOKUPS, LLM_COALESCED_REQUESTS, PROFILE_WRITE_DURATION, JOBS, JOB_QUEUE_WAIT)
+
+def record_llm_usage(model: str, usage):
+    """Adds a completion's token usage (if the API reported it) to the token counters."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,30 +1,225 @@
+import asyncio
 import openai
+import httpx
 import os
 from dotenv import load_dotenv
+from typing import AsyncIterator, Dict, Optional, Type
+from pydantic import BaseModel, ValidationError
+from utils.response_cache import get_response_cache, make_cache_key
+from utils.resilience import (LLMError, LLMRateLimitError, LLMUnavailableError, LLMRequestError, LLM_MAX_RETRIES,
+                              backoff_delay, exceeds_backoff_max, get_circuit_breaker, get_rate_limiter)
+from utils.metrics import (logger, LLM_REQUESTS, LLM_REQUEST_DURATION, LLM_CACHE_LOOKUPS, LLM_COALESCED_REQUESTS,
+                           record_llm_usage)
 
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-async def generate_llm_response(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200):
-    """Generate a response from the OpenAI language model."""
+# --- Client Configuration ---
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5.0"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60.0"))
+
+_client = None
+_semaphore = None
+_inflight: Dict[str, "asyncio.Task[str]"] = {}  # Cache key -> completion currently being fetched
+
+def get_llm_client() -> openai.AsyncOpenAI:
+    """Returns the process-wide async OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        # Retries are handled by _call_with_resilience, so the SDK's own are disabled to avoid multiplying them
+        _client = openai.AsyncOpenAI(api_key=openai.api_key, http_client=http_client, max_retries=0)
+    return _client
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Caps the number of completions in flight from this process."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+async def close_llm_client():
+    """Closes the shared client and its connection pool."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def _retry_after(error: openai.APIStatusError) -> Optional[float]:
+    headers = error.response.headers if error.response is not None else {}
     try:
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+def _translate_error(error: openai.APIError) -> LLMError:
+    """Maps SDK exceptions onto the typed errors the endpoints understand."""
+    if isinstance(error, openai.RateLimitError):
+        return LLMRateLimitError(f"A 429 status code was received: {error}", retry_after=_retry_after(error))
+    if isinstance(error, openai.APIConnectionError):
+        return LLMUnavailableError(f"The server could not be reached: {error}")
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return LLMUnavailableError(f"The server returned {error.status_code}: {error}", retry_after=_retry_after(error))
+    return LLMRequestError(f"The request was rejected: {error}")
+
+async def _call_with_resilience(model: str, call):
+    """Runs `call` under the model's rate limiter and circuit breaker, retrying transient failures.
+
+    Rate limits, connection errors, timeouts and 5xx responses are retried with
+    exponential backoff and jitter (honouring Retry-After); a Retry-After longer
+    than LLM_BACKOFF_MAX and other 4xx responses fail immediately. Raises an LLMError subclass once retries are exhausted.
+    """
+    with LLM_REQUEST_DURATION.time(model=model):
+        try:
+            result = await _call_with_retries(model, call)
+        except LLMError as e:
+            LLM_REQUESTS.inc(model=model, outcome=type(e).__name__)
+            raise
+        LLM_REQUESTS.inc(model=model, outcome="ok")
+        return result
+
+async def _call_with_retries(model: str, call):
+    breaker = get_circuit_breaker(model)
+    limiter = get_rate_limiter(model)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        breaker.before_call()
+        try:
+            result = await call()
+        except openai.APIError as e:
+            error = _translate_error(e)
+            if isinstance(error, LLMRequestError):
+                breaker.record_neutral()
+                raise error from e
+            breaker.record_failure()
+            if attempt == LLM_MAX_RETRIES or exceeds_backoff_max(error.retry_after):
+                # A long Retry-After is passed on to the client instead of holding the request open
+                raise error from e
+            delay = backoff_delay(attempt, error.retry_after)
+            logger.warning("LLM call failed (%s); retrying in %.2fs (attempt %d of %d).", error, delay, attempt + 1, LLM_MAX_RETRIES)
+            await asyncio.sleep(delay)
+        except BaseException:
+            breaker.record_neutral()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+async def _create_completion(prompt: str, model: str, max_tokens: int, **kwargs):
+    client = get_llm_client()
+    async with _get_semaphore():
+        return await client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            **kwargs
         )
-        return response.choices[0].message.content
-    except openai.APIConnectionError as e:
-        print("The server could not be reached")
-        print(e.__cause__)  # an underlying Exception, likely raised within httpx.
-        return f"The server could not be reached: {e}"
-    except openai.RateLimitError as e:
-        print("A 429 status code was received; we should back off exponentially.")
-        print(e)
-        return f"A 429 status code was received: {e}"
-    except openai.APIStatusError as e:
-        print("Another non-200-range status code was received")
-        print(e)
-        return f"Another non-200-range status code was received: {e}"
\ No newline at end of file
+
+async def generate_llm_response(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200, use_cache: bool = False, refresh_cache: bool = False) -> str:
+    """Generate a response from the OpenAI language model.
+
+    With use_cache=True the completion is looked up in (and stored to) the
+    response cache; only use it for prompts that do not depend on user data.
+    refresh_cache=True skips the lookup but still stores the new completion.
+    Raises an LLMError subclass if the model cannot produce a completion.
+    """
+    key = make_cache_key(prompt, model, max_tokens)
+    if use_cache and not refresh_cache:
+        cached = await asyncio.to_thread(get_response_cache().get, key)
+        LLM_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+    # Single flight: concurrent identical requests share one upstream call. The shared
+    # task is shielded so a caller that gets cancelled does not cancel it for the others.
+    task = _inflight.get(key)
+    is_leader = task is None
+    if is_leader:
+        task = asyncio.create_task(_fetch_completion(prompt, model, max_tokens))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        LLM_COALESCED_REQUESTS.inc()
+    content = await asyncio.shield(task)
+    if is_leader and use_cache and content:
+        await asyncio.to_thread(get_response_cache().set, key, content)
+    return content
+
+async def _fetch_completion(prompt: str, model: str, max_tokens: int) -> str:
+    response = await _call_with_resilience(model, lambda: _create_completion(prompt, model, max_tokens))
+    record_llm_usage(model, response.usage)
+    return response.choices[0].message.content
+
+async def generate_structured_llm_response(prompt: str, schema: Type[BaseModel], model: str = "gpt-4o-mini", max_tokens: int = 600) -> Optional[BaseModel]:
+    """Generate a JSON-schema-constrained response and validate it into `schema`.
+
+    Returns None if the call fails or the output does not validate, so callers
+    can fall back to the free-text prompts.
+    """
+    response_format = {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema(), "strict": True},
+    }
+    try:
+        response = await _call_with_resilience(model, lambda: _create_completion(prompt, model, max_tokens, response_format=response_format))
+        record_llm_usage(model, response.usage)
+        return schema.model_validate_json(response.choices[0].message.content or "")
+    except ValidationError as e:
+        logger.warning("Structured response did not match %s: %s", schema.__name__, e)
+    except LLMError as e:
+        logger.warning("Structured response request failed: %s", e)
+    return None
+
+async def stream_llm_response(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200) -> AsyncIterator[str]:
+    """Generate a response from the OpenAI language model, yielding text chunks as they arrive.
+
+    Opening the stream is retried like any other call; a failure after the
+    first chunk is raised as an LLMError without retrying.
+    """
+    client = get_llm_client()
+    async with _get_semaphore():
+        stream = await _call_with_resilience(model, lambda: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        ))
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    record_llm_usage(model, chunk.usage)  # Only the final chunk carries usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except openai.APIError as e:
+            get_circuit_breaker(model).record_failure()
+            raise _translate_error(e) from e
+
+async def generate_llm_responses(requests: list, concurrency: int = 8, use_cache: bool = False):
+    """Runs several (prompt, max_tokens) requests concurrently, at most `concurrency` at a time.
+
+    Results come back in request order; a request that raised yields the exception
+    instead of a string, so callers can keep the partial results.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(prompt, max_tokens):
+        async with semaphore:
+            return await generate_llm_response(prompt, max_tokens=max_tokens, use_cache=use_cache)
+
+    return await asyncio.gather(*(run(prompt, max_tokens) for prompt, max_tokens in requests), return_exceptions=True)
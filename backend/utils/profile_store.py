@@ -0,0 +1,311 @@
+import abc
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from utils.metrics import logger, PROFILE_WRITE_DURATION
+
+# --- Store Configuration ---
+PROFILE_STORE_BACKEND = os.getenv("PROFILE_STORE_BACKEND", "sqlite")
+PROFILE_STORE_PATH = os.getenv("PROFILE_STORE_PATH", "user_profiles.db")
+PROFILE_STORE_BUSY_TIMEOUT = float(os.getenv("PROFILE_STORE_BUSY_TIMEOUT", "2"))  # Seconds to wait for another writer before giving up
+LEGACY_PROFILES_FILE = "user_profiles.json"
+
+class VersionConflictError(Exception):
+    """Raised when a profile changed in the store since it was loaded."""
+
+    def __init__(self, user_id: str, expected_version: int):
+        super().__init__(f"Profile {user_id} is no longer at version {expected_version}")
+        self.user_id = user_id
+        self.expected_version = expected_version
+
+def session_last_active(data: dict, default: float) -> Optional[float]:
+    """When the profile's chatbot session was last used, or None without a session.
+
+    Sessions saved before they carried a timestamp count as active at `default`.
+    """
+    state = data.get("chatbot_state")
+    if not state:
+        return None
+    return state.get("last_active") or default
+
+class ProfileStoreBusyError(Exception):
+    """Raised when the store stayed locked by another writer for PROFILE_STORE_BUSY_TIMEOUT."""
+
+class ProfileStore(abc.ABC):
+    """Persists learner profiles as plain dicts, one record per user.
+
+    Every record carries a version that is bumped on each write. Passing the
+    version a profile was loaded at to save() makes the write conditional, so
+    workers sharing the store cannot silently overwrite each other.
+    """
+
+    def load(self, user_id: str) -> Optional[dict]:
+        return self.load_versioned(user_id)[0]
+
+    @abc.abstractmethod
+    def load_versioned(self, user_id: str) -> Tuple[Optional[dict], int]:
+        """Returns (data, version); a missing profile is (None, 0)."""
+
+    @abc.abstractmethod
+    def save(self, user_id: str, data: dict, expected_version: Optional[int] = None) -> int:
+        """Writes one profile and returns its new version.
+
+        Raises VersionConflictError if expected_version is given and the stored
+        version differs (0 means the profile must not exist yet).
+        """
+
+    @abc.abstractmethod
+    def save_many(self, items: Iterable[Tuple[str, dict]]):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, user_id: str, expected_version: Optional[int] = None):
+        """Removes one profile.
+
+        Raises VersionConflictError if expected_version is given and the stored
+        version differs, e.g. because the profile was written since it was loaded.
+        """
+
+    @abc.abstractmethod
+    def user_ids(self) -> Iterator[str]:
+        pass
+
+    @abc.abstractmethod
+    def idle_sessions(self, cutoff: Optional[float], max_sessions: int) -> List[str]:
+        """Users whose chatbot session was last active before cutoff, plus the least
+        recently active ones beyond the newest max_sessions.
+        """
+
+    def claim_periodic_task(self, name: str, min_interval: float) -> bool:
+        """True if no process has claimed the named task within min_interval seconds.
+
+        Lets one worker among several sharing the store run housekeeping.
+        """
+        return True
+
+    def close(self):
+        pass
+
+UPSERT_PROFILE = ("INSERT INTO profiles (user_id, data, updated_at, version, session_last_active) VALUES (?, ?, ?, 1, ?) "
+                  "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at, version = version + 1, "
+                  "session_last_active = excluded.session_last_active")
+
+class SQLiteProfileStore(ProfileStore):
+    """Per-user upserts into a SQLite database in WAL mode.
+
+    Each save is its own transaction, so a crash can lose at most the write in
+    progress and never another user's profile. A write that cannot get the
+    database lock within PROFILE_STORE_BUSY_TIMEOUT raises ProfileStoreBusyError.
+    """
+
+    def __init__(self, path: str = PROFILE_STORE_PATH, legacy_file: Optional[str] = LEGACY_PROFILES_FILE):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=PROFILE_STORE_BUSY_TIMEOUT)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS profiles (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, version INTEGER NOT NULL DEFAULT 1)")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(profiles)")]
+        if "version" not in columns:
+            self._db.execute("ALTER TABLE profiles ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        if "session_last_active" not in columns:
+            # Kept out of the JSON so the session sweep can use an index instead of parsing every profile
+            self._db.execute("ALTER TABLE profiles ADD COLUMN session_last_active REAL")
+            self._db.execute("UPDATE profiles SET session_last_active = COALESCE(json_extract(data, '$.chatbot_state.last_active'), updated_at) "
+                             "WHERE json_extract(data, '$.chatbot_state') IS NOT NULL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS profiles_by_session_last_active ON profiles (session_last_active) WHERE session_last_active IS NOT NULL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS periodic_tasks (name TEXT PRIMARY KEY, claimed_at REAL NOT NULL)")
+        if legacy_file:
+            self._import_legacy_file(legacy_file)
+
+    def _begin(self):
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e) or "busy" in str(e):
+                raise ProfileStoreBusyError(str(e)) from e
+            raise
+
+    def _import_legacy_file(self, legacy_file: str):
+        """One-time migration of an existing user_profiles.json into an empty database."""
+        if self._db.execute("SELECT 1 FROM profiles LIMIT 1").fetchone() is not None:
+            return
+        try:
+            with open(legacy_file, "r") as f:
+                legacy_profiles = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self.save_many(legacy_profiles.items())
+        logger.info("Imported %d user profiles from %s.", len(legacy_profiles), legacy_file)
+
+    def load_versioned(self, user_id: str) -> Tuple[Optional[dict], int]:
+        with self._lock:
+            row = self._db.execute("SELECT data, version FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, 0)
+
+    def save(self, user_id: str, data: dict, expected_version: Optional[int] = None) -> int:
+        payload = json.dumps(data)
+        now = time.time()
+        with self._lock, PROFILE_WRITE_DURATION.time(backend="sqlite"):
+            self._begin()
+            try:
+                row = self._db.execute("SELECT version FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+                current_version = row[0] if row else 0
+                if expected_version is not None and expected_version != current_version:
+                    raise VersionConflictError(user_id, expected_version)
+                self._db.execute(UPSERT_PROFILE, (user_id, payload, now, session_last_active(data, now)))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return current_version + 1
+
+    def save_many(self, items: Iterable[Tuple[str, dict]]):
+        now = time.time()
+        rows = [(user_id, json.dumps(data), now, session_last_active(data, now)) for user_id, data in items]
+        with self._lock, PROFILE_WRITE_DURATION.time(backend="sqlite"):
+            self._begin()
+            try:
+                self._db.executemany(UPSERT_PROFILE, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete(self, user_id: str, expected_version: Optional[int] = None):
+        with self._lock:
+            if expected_version is None:
+                self._db.execute("DELETE FROM profiles WHERE user_id = ?", (user_id,))
+                return
+            cursor = self._db.execute("DELETE FROM profiles WHERE user_id = ? AND version = ?", (user_id, expected_version))
+        if cursor.rowcount == 0:
+            raise VersionConflictError(user_id, expected_version)
+
+    def user_ids(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT user_id FROM profiles ORDER BY user_id").fetchall()
+        return iter([row[0] for row in rows])
+
+    def idle_sessions(self, cutoff: Optional[float], max_sessions: int) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user_id FROM profiles WHERE session_last_active < ? UNION "
+                "SELECT user_id FROM (SELECT user_id FROM profiles WHERE session_last_active IS NOT NULL "
+                "ORDER BY session_last_active DESC LIMIT -1 OFFSET ?)",
+                (cutoff if cutoff is not None else float("-inf"), max_sessions)).fetchall()
+        return [row[0] for row in rows]
+
+    def claim_periodic_task(self, name: str, min_interval: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO periodic_tasks (name, claimed_at) VALUES (?, ?) "
+                                      "ON CONFLICT(name) DO UPDATE SET claimed_at = excluded.claimed_at WHERE claimed_at <= ?",
+                                      (name, now, now - min_interval))
+        return cursor.rowcount == 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class JSONFileProfileStore(ProfileStore):
+    """The original single-file layout, kept for small deployments.
+
+    Writes still rewrite the whole file, but go through a temporary file and an
+    atomic rename so a crash mid-write can no longer truncate it. Versions are
+    tracked in memory only, so this backend is safe for a single worker only.
+    """
+
+    def __init__(self, path: str = LEGACY_PROFILES_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles: Optional[Dict[str, dict]] = None
+        self._versions: Dict[str, int] = {}
+        self._legacy_sessions_seen: Dict[str, float] = {}  # Untimestamped sessions age from when first swept
+
+    def _all(self) -> Dict[str, dict]:
+        if self._profiles is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._profiles = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._profiles = {}
+        return self._profiles
+
+    def _flush(self):
+        with PROFILE_WRITE_DURATION.time(backend="json"):
+            self._write_file()
+
+    def _write_file(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".user_profiles.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._profiles, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _version(self, user_id: str) -> int:
+        if user_id not in self._all():
+            return 0
+        return self._versions.setdefault(user_id, 1)
+
+    def load_versioned(self, user_id: str) -> Tuple[Optional[dict], int]:
+        with self._lock:
+            return self._all().get(user_id), self._version(user_id)
+
+    def save(self, user_id: str, data: dict, expected_version: Optional[int] = None) -> int:
+        with self._lock:
+            current_version = self._version(user_id)
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflictError(user_id, expected_version)
+            self._all()[user_id] = data
+            self._versions[user_id] = current_version + 1
+            self._flush()
+            return current_version + 1
+
+    def save_many(self, items: Iterable[Tuple[str, dict]]):
+        with self._lock:
+            for user_id, data in items:
+                self._versions[user_id] = self._version(user_id) + 1
+                self._all()[user_id] = data
+            self._flush()
+
+    def delete(self, user_id: str, expected_version: Optional[int] = None):
+        with self._lock:
+            if expected_version is not None and expected_version != self._version(user_id):
+                raise VersionConflictError(user_id, expected_version)
+            self._versions.pop(user_id, None)
+            if self._all().pop(user_id, None) is not None:
+                self._flush()
+
+    def user_ids(self) -> Iterator[str]:
+        with self._lock:
+            return iter(sorted(self._all()))
+
+    def idle_sessions(self, cutoff: Optional[float], max_sessions: int) -> List[str]:
+        # The profiles are already in memory, so a scan costs no I/O and nothing is rewritten
+        now = time.time()
+        with self._lock:
+            sessions = []
+            for user_id, data in self._all().items():
+                state = data.get("chatbot_state")
+                if state:
+                    sessions.append((state.get("last_active") or self._legacy_sessions_seen.setdefault(user_id, now), user_id))
+        sessions.sort(reverse=True)
+        idle = [user_id for last_active, user_id in sessions[:max_sessions] if cutoff is not None and last_active < cutoff]
+        return idle + [user_id for _, user_id in sessions[max_sessions:]]
+
+def create_profile_store(backend: str = PROFILE_STORE_BACKEND, path: Optional[str] = None) -> ProfileStore:
+    """Builds the configured profile store backend."""
+    if backend == "sqlite":
+        return SQLiteProfileStore(path or PROFILE_STORE_PATH)
+    if backend == "json":
+        return JSONFileProfileStore(path or LEGACY_PROFILES_FILE)
+    raise ValueError(f"Unknown profile store backend: {backend}")
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+
+# --- Resilience Configuration ---
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8.0"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "50"))  # Per model; 0 disables the limiter
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "100"))
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "10.0"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30.0"))
+
+# --- Errors ---
+class LLMError(Exception):
+    """Base class for LLM failures; status_code is what the API should answer with."""
+    status_code = 502
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMRateLimitError(LLMError):
+    """The upstream (or our own limiter) is rate limiting us."""
+    status_code = 429
+
+class LLMUnavailableError(LLMError):
+    """The upstream could not be reached, timed out or returned a 5xx."""
+    status_code = 503
+
+class CircuitOpenError(LLMUnavailableError):
+    """The circuit breaker is open; the call was not attempted."""
+
+class LLMRequestError(LLMError):
+    """The upstream rejected the request itself (a non-retryable 4xx)."""
+    status_code = 502
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, never shorter than a server-provided Retry-After.
+
+    The result never exceeds LLM_BACKOFF_MAX; callers should give up rather than
+    retry when Retry-After asks for longer (see exceeds_backoff_max).
+    """
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, LLM_BACKOFF_MAX)
+
+def exceeds_backoff_max(retry_after: Optional[float]) -> bool:
+    return retry_after is not None and retry_after > LLM_BACKOFF_MAX
+
+class TokenBucket:
+    """Async token-bucket rate limiter."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT):
+        """Takes one token, waiting for it if needed; fails fast if the wait would exceed max_wait."""
+        async with self._lock:
+            self._refill()
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > max_wait:
+                raise LLMRateLimitError("Local LLM rate limit exceeded", retry_after=wait)
+            # Reserve the token now so concurrent callers queue up behind us
+            self._tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    """Opens after consecutive upstream failures and fails fast until the reset timeout.
+
+    After the timeout a single trial call is let through (half-open); its outcome
+    closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = LLM_CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError("LLM circuit breaker is open", retry_after=retry_after)
+        if state == "half_open":
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """The call finished without telling us anything about upstream health."""
+        self._trial_in_flight = False
+
+_rate_limiters: Dict[str, TokenBucket] = {}
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_rate_limiter(model: str) -> Optional[TokenBucket]:
+    if LLM_REQUESTS_PER_SECOND <= 0:
+        return None
+    if model not in _rate_limiters:
+        _rate_limiters[model] = TokenBucket(LLM_REQUESTS_PER_SECOND, LLM_RATE_LIMIT_BURST)
+    return _rate_limiters[model]
+
+def get_circuit_breaker(model: str) -> CircuitBreaker:
+    if model not in _circuit_breakers:
+        _circuit_breakers[model] = CircuitBreaker()
+    return _circuit_breakers[model]
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from utils.metrics import logger
+
+# --- Cache Configuration ---
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_BUSY_TIMEOUT = float(os.getenv("LLM_CACHE_BUSY_TIMEOUT", "1"))  # Seconds to wait for another worker's write
+
+def make_cache_key(prompt: str, model: str, max_tokens: int) -> str:
+    """Content-addresses a completion by everything that determines it."""
+    return hashlib.sha256(f"{model}\x00{max_tokens}\x00{prompt}".encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """An in-memory LRU of LLM completions with a TTL, backed by a SQLite file.
+
+    Memory misses fall through to disk, so entries precomputed offline (see
+    warm_cache.py) are served without an upstream call after a restart. The file
+    is shared by every worker; a read or write that fails (e.g. the database
+    stayed locked) is logged and treated as a miss rather than raised. Calls may
+    block on the file, so async callers should make them from a worker thread.
+    """
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=LLM_CACHE_BUSY_TIMEOUT)
+            self._db.execute("PRAGMA journal_mode=WAL")  # Readers never wait for a writer
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+            self._db.commit()
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return self.ttl <= 0 or time.time() - created_at < self.ttl
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry[0]):
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Response cache read failed; treating as a miss: %s", e)
+                return None
+            if row is None or not self._is_fresh(row[1]):
+                return None
+            self._remember(key, row[1], row[0])
+            return row[0]
+
+    def set(self, key: str, value: str):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)", (key, value, created_at))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self._db.rollback()
+                    logger.warning("Response cache write failed; the entry stays in memory only: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+_cache = None
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
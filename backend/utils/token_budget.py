@@ -0,0 +1,63 @@
+import os
+import tiktoken
+from typing import Dict, Optional
+from utils.metrics import logger
+
+# --- Budget Configuration ---
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "2000"))  # Upper bound for a whole prompt
+PROMPT_FIELD_MAX_TOKENS = int(os.getenv("PROMPT_FIELD_MAX_TOKENS", "400"))  # Upper bound for any single user-supplied profile field
+PROMPT_HISTORY_MAX_TOKENS = int(os.getenv("PROMPT_HISTORY_MAX_TOKENS", "1500"))  # Upper bound for the assessment answers
+CHARS_PER_TOKEN = 4  # Rough ratio for English text, used when the encoding cannot be loaded
+TRUNCATION_MARKER = " [...]"
+
+_encoding = None
+_encoding_failed = False
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")  # The gpt-4o family tokenizer
+        except Exception as e:  # The encoding file is downloaded on first use and may be unreachable
+            _encoding_failed = True
+            logger.error("Could not load the o200k_base encoding; token budgets use approximate counts: %s", e)
+    return _encoding
+
+def load_encoding():
+    """Loads the tokenizer up front (it may be downloaded on first use), so no request waits for it."""
+    _get_encoding()
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text to at most max_tokens tokens, marking the cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + TRUNCATION_MARKER
+    return text[:keep * CHARS_PER_TOKEN] + TRUNCATION_MARKER
+
+def fit_fields(fields: Dict[str, str], reserved_tokens: int = 0, field_caps: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+    """Truncates variable prompt fields so they fit next to reserved_tokens of fixed text.
+
+    Every field is capped at PROMPT_FIELD_MAX_TOKENS, unless field_caps gives it
+    its own limit. If together they still exceed the remaining budget, short
+    fields are kept whole and the rest share what is left evenly, so one
+    oversized field cannot crowd out the others.
+    """
+    budget = max(0, PROMPT_MAX_TOKENS - reserved_tokens)
+    field_caps = field_caps or {}
+    sizes = {name: min(count_tokens(value), field_caps.get(name, PROMPT_FIELD_MAX_TOKENS)) for name, value in fields.items()}
+    limits = {}
+    remaining_fields = len(sizes)
+    for name, size in sorted(sizes.items(), key=lambda item: item[1]):
+        limits[name] = min(size, budget // remaining_fields)
+        budget -= limits[name]
+        remaining_fields -= 1
+    return {name: truncate_to_tokens(value, limits[name]) for name, value in fields.items()}
@@ -0,0 +1,45 @@
+"""Precomputes the static career descriptions and soft skills blurbs into the response cache.
+
+Usage (from the backend directory):
+    python warm_cache.py            # fill in missing entries
+    python warm_cache.py --refresh  # regenerate every entry
+"""
+import argparse
+import asyncio
+from utils.constants import CAREER_RECOMMENDATIONS
+from utils.model_generations import generate_llm_response, close_llm_client
+from utils.response_cache import get_response_cache, make_cache_key
+from prompts.prompt_templates import get_job_description_prompt, get_soft_skills_prompt
+
+MODEL = "gpt-4o-mini"
+
+def static_requests():
+    """Yields the (prompt, max_tokens) pairs used by /recommend/careers."""
+    career_names = sorted({name for names in CAREER_RECOMMENDATIONS.values() for name in names})
+    for career_name in career_names:
+        yield get_job_description_prompt(career_name), 30
+    for focus_area in CAREER_RECOMMENDATIONS:
+        yield get_soft_skills_prompt(focus_area), 100
+
+async def warm(refresh: bool, concurrency: int):
+    cache = get_response_cache()
+    pending = [(prompt, max_tokens) for prompt, max_tokens in static_requests()
+               if refresh or cache.get(make_cache_key(prompt, MODEL, max_tokens)) is None]
+    print(f"Warming {len(pending)} cache entries...")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(prompt, max_tokens):
+        async with semaphore:
+            await generate_llm_response(prompt, model=MODEL, max_tokens=max_tokens, use_cache=True, refresh_cache=True)
+
+    await asyncio.gather(*(run(prompt, max_tokens) for prompt, max_tokens in pending), return_exceptions=True)
+    await close_llm_client()
+    missing = sum(1 for prompt, max_tokens in static_requests() if cache.get(make_cache_key(prompt, MODEL, max_tokens)) is None)
+    print(f"Done. {missing} entries could not be generated.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refresh", action="store_true", help="Regenerate entries that are already cached.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum LLM calls in flight.")
+    args = parser.parse_args()
+    asyncio.run(warm(args.refresh, args.concurrency))
@@ -0,0 +1,112 @@
+"""A stand-in for the OpenAI chat completions API, for benchmarking without real LLM calls.
+
+Responses are shaped like the real ones the backend parses (focus area blocks,
+JSON for structured requests, plain prose otherwise), with configurable
+latency and token rate.
+
+Usage:
+    python fake_llm_server.py --port 9000 --latency 0.3 --tokens-per-second 80
+    # then start the backend with OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=fake
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from utils.constants import FOCUS_AREAS  # noqa: E402
+
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.3"))  # Seconds before the first token
+TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "80"))  # 0 means instant
+FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))  # Fraction of requests answered with a 429
+
+WORDS = ("thoughtful organized curious collaborative analytical creative resilient adaptable motivated careful "
+         "people technology design problems learning teamwork planning goals growth energy").split()
+
+app = FastAPI()
+
+def fake_text(prompt: str, max_tokens: int, structured: bool) -> str:
+    if structured:
+        areas = random.sample(FOCUS_AREAS, 3)
+        return json.dumps({
+            "personality_traits": " ".join(random.choices(WORDS, k=40)),
+            "interests": " ".join(random.choices(WORDS, k=20)),
+            "focus_areas": [{"focus_area": area, "reasoning": " ".join(random.choices(WORDS, k=15))} for area in areas],
+        })
+    if "Focus Area 1:" in prompt:
+        offered = [area for area in FOCUS_AREAS if area in prompt] or FOCUS_AREAS
+        blocks = [f"Focus Area {i}: {area}\nReasoning: {' '.join(random.choices(WORDS, k=15))}"
+                  for i, area in enumerate(random.sample(offered, min(3, len(offered))), start=1)]
+        return "\n\n".join(blocks)
+    return " ".join(random.choices(WORDS, k=max(1, max_tokens - 5)))
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        return JSONResponse(status_code=429, headers={"retry-after": "1"},
+                            content={"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_error"}})
+
+    prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+    max_tokens = int(body.get("max_tokens") or 200)
+    structured = (body.get("response_format") or {}).get("type") == "json_schema"
+    text = fake_text(prompt, max_tokens, structured)
+    usage = {"prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(text)}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+
+    await asyncio.sleep(LATENCY)
+    if not body.get("stream"):
+        if TOKENS_PER_SECOND:
+            await asyncio.sleep(usage["completion_tokens"] / TOKENS_PER_SECOND)
+        return {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if TOKENS_PER_SECOND:
+                await asyncio.sleep(1 / TOKENS_PER_SECOND)
+            delta = {"content": word if i == 0 else " " + word}
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(final)}\n\n"
+        if include_usage:
+            usage_chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                           "choices": [], "usage": usage}
+            yield f"data: {json.dumps(usage_chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND, help="Generation speed; 0 for instant.")
+    parser.add_argument("--failure-rate", type=float, default=FAILURE_RATE, help="Fraction of requests answered with a 429.")
+    args = parser.parse_args()
+    LATENCY, TOKENS_PER_SECOND, FAILURE_RATE = args.latency, args.tokens_per_second, args.failure_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
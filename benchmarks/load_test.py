@@ -0,0 +1,203 @@
+"""Drives scripted assessment sessions against the backend and reports latency, throughput and memory.
+
+Each session walks /chatbot/interact through the whole assessment, then calls
+/recommend/focus and /recommend/careers, with `--concurrency` sessions in flight.
+
+Usage:
+    # Against servers you started yourself:
+    python load_test.py --base-url http://127.0.0.1:8000 --sessions 200 --concurrency 50
+
+    # Or let it start the fake LLM server and a backend on a fresh profile store:
+    python load_test.py --spawn --sessions 200 --concurrency 50 --workers 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(HERE, "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+from utils.constants import PERSONALITY_QUESTIONS, FOCUS_AREAS  # noqa: E402
+
+ANSWERS = ["I enjoy it in small groups.", "I like to plan ahead.", "I try to listen first.", "Structured, mostly.",
+           "I like meeting new people.", "Building and designing things.", "A thinker.", "I set small milestones.",
+           "I take calculated risks.", "Reading and sports."]
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process (and its children, for multi-worker uvicorn) in MB; Linux only."""
+    total_kb = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            return None
+    return total_kb / 1024
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, path: str, body: dict) -> Optional[dict]:
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            self.latencies[name].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                self.errors[name] += 1
+                return None
+            return response.json()
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+
+async def run_session(client: httpx.AsyncClient, recorder: Recorder, user_id: str):
+    messages = ["hi", str(random.randint(16, 60)), "Solving hard problems"] + ANSWERS[:len(PERSONALITY_QUESTIONS)] + ["Bengaluru, India"]
+    for message in messages:
+        step = await recorder.call(client, "chatbot_interact", "/chatbot/interact", {"user_id": user_id, "message": message})
+        if step is None:
+            return
+    focus = await recorder.call(client, "recommend_focus", "/recommend/focus", {"user_id": user_id})
+    areas = (focus or {}).get("recommended_focus_areas") or [random.choice(FOCUS_AREAS)]
+    await recorder.call(client, "recommend_careers", "/recommend/careers", {"user_id": user_id, "chosen_focus_area": areas[0]})
+
+async def run_load(base_url: str, sessions: int, concurrency: int, server_pid: Optional[int], timeout: float) -> dict:
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(concurrency)
+    peak_rss = rss_mb(server_pid) if server_pid else None
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def bounded(i):
+            async with semaphore:
+                await run_session(client, recorder, f"bench_{run_id}_{i}")
+
+        async def sample_memory():
+            nonlocal peak_rss
+            while True:
+                current = rss_mb(server_pid)
+                if current is not None:
+                    peak_rss = max(peak_rss or 0, current)
+                await asyncio.sleep(0.2)
+
+        sampler = asyncio.create_task(sample_memory()) if server_pid else None
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+        if sampler:
+            sampler.cancel()
+
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    report = {"sessions": sessions, "concurrency": concurrency, "elapsed_s": round(elapsed, 3),
+              "requests": total_requests, "requests_per_s": round(total_requests / elapsed, 2),
+              "sessions_per_s": round(sessions / elapsed, 2), "peak_server_rss_mb": round(peak_rss, 1) if peak_rss else None,
+              "endpoints": {}}
+    for name, values in sorted(recorder.latencies.items()):
+        report["endpoints"][name] = {
+            "count": len(values), "errors": recorder.errors.get(name, 0),
+            "mean_ms": round(statistics.mean(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return report
+
+def print_report(report: dict):
+    print(f"{report['sessions']} sessions at concurrency {report['concurrency']} in {report['elapsed_s']}s: "
+          f"{report['requests_per_s']} req/s, {report['sessions_per_s']} sessions/s"
+          + (f", peak backend RSS {report['peak_server_rss_mb']} MB" if report["peak_server_rss_mb"] else ""))
+    print(f"{'endpoint':<20}{'count':>8}{'errors':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<20}{stats['count']:>8}{stats['errors']:>8}{stats['mean_ms']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+async def wait_until_up(url: str, deadline: float = 30.0):
+    async with httpx.AsyncClient() as client:
+        start = time.monotonic()
+        while time.monotonic() - start < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {deadline}s")
+
+def spawn_servers(args, workdir: str):
+    """Starts the fake LLM server and a backend that talks to it, both on a fresh working directory."""
+    fake = subprocess.Popen([sys.executable, os.path.join(HERE, "fake_llm_server.py"), "--port", str(args.fake_port),
+                             "--latency", str(args.llm_latency), "--tokens-per-second", str(args.llm_tokens_per_second)])
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{args.fake_port}/v1", OPENAI_API_KEY="fake",
+               PROFILE_STORE_PATH=os.path.join(workdir, "user_profiles.db"), LLM_CACHE_PATH=os.path.join(workdir, "llm_cache.db"),
+               PYTHONPATH=os.path.abspath(BACKEND_DIR), LOG_LEVEL="WARNING")
+    backend = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--workers", str(args.workers),
+                                "--log-level", "warning"], cwd=workdir, env=env)
+    return fake, backend
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Backend to test; defaults to the spawned one.")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--server-pid", type=int, default=None, help="Backend PID to sample memory from.")
+    parser.add_argument("--json", default=None, help="Also write the report to this file.")
+    parser.add_argument("--spawn", action="store_true", help="Start the fake LLM server and a backend.")
+    parser.add_argument("--port", type=int, default=8100, help="Port for the spawned backend.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned backend.")
+    parser.add_argument("--fake-port", type=int, default=9000)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80)
+    args = parser.parse_args()
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="careercraft_bench_") as workdir:
+        try:
+            base_url, server_pid = args.base_url, args.server_pid
+            if args.spawn:
+                processes = list(spawn_servers(args, workdir))
+                base_url = base_url or f"http://127.0.0.1:{args.port}"
+                server_pid = server_pid or processes[1].pid
+                asyncio.run(wait_until_up(f"http://127.0.0.1:{args.fake_port}/docs"))
+                asyncio.run(wait_until_up(f"{base_url}/metrics"))
+            base_url = base_url or "http://127.0.0.1:8000"
+
+            report = asyncio.run(run_load(base_url, args.sessions, args.concurrency, server_pid, args.timeout))
+            print_report(report)
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump(report, f, indent=4)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,107 @@
 import streamlit as st
 import requests
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- Constants ---
-API_BASE_URL = "http://localhost:8000"
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT", "5")), float(os.getenv("API_READ_TIMEOUT", "120")))  # (connect, read) seconds
+BACKGROUND_WORKERS = 8
+RESULT_CACHE_TTL = 3600  # Seconds to reuse career recommendations for the same user and focus area
+POLL_INTERVAL = 0.5  # Seconds between progress updates of a background call
 
 # --- Helper Functions ---
-def call_api(endpoint, method="get", data=None, params=None):
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One keep-alive connection pool shared by every script run and background call."""
+    session = requests.Session()
+    retries = Retry(total=2, connect=2, read=0, backoff_factor=0.3, allowed_methods=["GET"])  # Only idempotent reads are retried
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BACKGROUND_WORKERS + 4, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="careercraft-api")
+
+def request_json(endpoint, method="get", data=None, params=None):
+    """Calls the backend and returns the decoded JSON body; raises requests.exceptions.RequestException on failure."""
     url = f"{API_BASE_URL}{endpoint}"
+    response = get_http_session().request(method.upper(), url, json=data, params=params, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def call_api(endpoint, method="get", data=None, params=None):
     try:
-        if method == "get":
-            response = requests.get(url, params=params)
-        elif method == "post":
-            response = requests.post(url, json=data)
-        response.raise_for_status()
-        return response.json()
+        return request_json(endpoint, method=method, data=data, params=params)
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: {e}")
         return None
 
-def fetch_user_profile(user_id: str):
-    """Fetches the latest user profile from the backend."""
-    response = call_api(f"/users/{user_id}", method="get")
+def stream_api(endpoint, data=None):
+    """Posts to a server-sent events endpoint and yields (event, payload) pairs as they arrive."""
+    url = f"{API_BASE_URL}{endpoint}"
+    try:
+        with get_http_session().post(url, json=data, stream=True, timeout=API_TIMEOUT) as response:
+            response.raise_for_status()
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event:
+                    yield event, json.loads(line[len("data:"):].strip())
+                    event = None
+    except requests.exceptions.RequestException as e:
+        st.error(f"API Error: {e}")
+
+def fetch_user_profile(user_id: str, fields=None):
+    """Fetches the latest user profile from the backend, optionally only the given fields."""
+    response = call_api(f"/users/{user_id}", method="get", params={"fields": ",".join(fields)} if fields else None)
     return response
 
+@st.cache_data(ttl=RESULT_CACHE_TTL, show_spinner=False)
+def fetch_career_recommendations(user_id: str, chosen_focus_area: str, assessment_round: int):
+    """Career recommendations are stable for a completed assessment, so reruns reuse them.
+
+    assessment_round only keys the cache, so retaking the assessment fetches fresh ones.
+    """
+    return request_json("/recommend/careers", method="post", data={"user_id": user_id, "chosen_focus_area": chosen_focus_area})
+
+@st.fragment(run_every=POLL_INTERVAL)
+def show_progress(key, label):
+    """Redraws only itself while the call is pending, then reruns the whole app to show the result."""
+    pending = st.session_state.get("pending_calls", {})
+    if key not in pending or pending[key][0].done():
+        st.rerun()
+    st.info(f"{label} ({time.monotonic() - pending[key][1]:.0f}s)")
+
+def run_in_background(key, label, fn, *args):
+    """Runs fn(*args) on the shared worker pool without holding up the script.
+
+    The future is kept in session state, so every rerun picks up the same call
+    instead of starting a new one. Returns (done, result): while the call is
+    pending, a progress fragment is shown and the rest of the page stays usable;
+    once it finishes, result is its return value, or None after showing the error.
+    """
+    pending = st.session_state.setdefault("pending_calls", {})
+    if key not in pending:
+        pending[key] = (get_executor().submit(fn, *args), time.monotonic())
+    future, _ = pending[key]
+    if not future.done():
+        show_progress(key, label)
+        return False, None
+    del pending[key]
+    try:
+        return True, future.result()
+    except requests.exceptions.RequestException as e:
+        st.error(f"API Error: {e}")
+        return True, None
+
 # --- Streamlit App ---
 def main():
     st.title("CareerCraft AI")
@@ -39,6 +117,12 @@ def main():
         st.session_state.is_assessment_complete = False
     if "focus_recommendations" not in st.session_state:
         st.session_state.focus_recommendations = None
+    if "career_request" not in st.session_state:
+        st.session_state.career_request = None
+    if "career_recommendations" not in st.session_state:
+        st.session_state.career_recommendations = None
+    if "assessment_round" not in st.session_state:
+        st.session_state.assessment_round = 0
 
     # --- Get User Name ---
     if not st.session_state.user_name:
@@ -69,23 +153,42 @@ def main():
     st.header("Chatbot")
     chat_placeholder = st.empty()
 
-    user_message = st.text_input(f"{st.session_state.user_name}:") # Dynamic username for input
-    if st.button("Send Message"):
+    # A form submits once per message and clears its input, so no extra rerun is needed to reset it
+    with st.form("chat_form", clear_on_submit=True):
+        user_message = st.text_input(f"{st.session_state.user_name}:") # Dynamic username for input
+        send_clicked = st.form_submit_button("Send Message")
+    if send_clicked:
         if user_id and user_message:
             st.session_state.chat_history.append({"role": "user", "content": user_message})
             data = {"user_id": user_id, "message": user_message}
-            response = call_api("/chatbot/interact", method="post", data=data)
+            response = None
+            streamed_text = ""
+            stream_placeholder = st.empty()
+            for event, payload in stream_api("/chatbot/interact/stream", data=data):
+                if event == "delta":
+                    streamed_text += payload["text"]
+                    stream_placeholder.markdown(f"CareerCraft: {streamed_text}")
+                elif event == "done":
+                    response = payload
+                elif event == "error":
+                    st.error(payload.get("detail", "Streaming error."))
+            stream_placeholder.empty()  # The reply is rendered with the history below
             if response:
                 chatbot_response = response.get("response")
                 is_complete = response.get("is_assessment_complete", False)
                 if chatbot_response:
                     st.session_state.chat_history.append({"role": "career_craft", "content": chatbot_response}) # Use "career_craft" role
+                if is_complete:
+                    # A new assessment makes earlier recommendations stale
+                    st.session_state.focus_recommendations = None
+                    st.session_state.career_request = None
+                    st.session_state.career_recommendations = None
+                    st.session_state.assessment_round += 1
                 st.session_state.is_assessment_complete = is_complete
             else:
                 st.session_state.chat_history.append({"role": "career_craft", "content": "Sorry, I encountered an error."})
         else:
             st.warning("Please enter a message.")
-        st.rerun()
 
     with chat_placeholder.container():
         for message in st.session_state.chat_history:
@@ -96,39 +199,58 @@ def main():
 
     # --- Focus Recommendation ---
     st.header("Focus Recommendation")
-    if st.button("Get Focus Recommendation", disabled=not st.session_state.is_assessment_complete):
+    # Recommendations are kept in session state and redrawn on every rerun; only the first click calls the backend
+    if st.button("Get Focus Recommendation", disabled=not st.session_state.is_assessment_complete) and not st.session_state.focus_recommendations:
         if user_id:
             print("User Profile for Focus Recommendation:", st.session_state.user_profile)
-            response = call_api("/recommend/focus", method="post", data={"user_id": user_id})
+            response = None
+            streamed_areas = []
+            stream_placeholder = st.empty()
+            for event, payload in stream_api("/recommend/focus/stream", data={"user_id": user_id}):
+                if event == "recommendation":
+                    streamed_areas.append(f"- **{payload['focus_area']}**: {payload['reasoning']}")
+                    stream_placeholder.markdown("\n".join(streamed_areas))
+                elif event == "done":
+                    response = payload
+            stream_placeholder.empty()
             if response:
                 st.session_state.focus_recommendations = response
-                st.subheader("Recommended Focus Areas:")
-                for area in response.get("recommended_focus_areas", []):
-                    st.markdown(f"- **{area}**")
-                if "reasoning" in response:
-                    st.write("Reasoning:", response["reasoning"])
             else:
                 st.error("Failed to get focus recommendations.")
         else:
             st.warning("Please enter your name to proceed.")
+    if st.session_state.focus_recommendations:
+        response = st.session_state.focus_recommendations
+        st.subheader("Recommended Focus Areas:")
+        for area in response.get("recommended_focus_areas", []):
+            st.markdown(f"- **{area}**")
+        if "reasoning" in response:
+            st.write("Reasoning:", response["reasoning"])
 
     # --- Career Recommendation ---
     st.header("Career Recommendation")
     chosen_focus_area = st.text_input("Chosen Focus Area:", "")
     if st.button("Get Career Recommendation", disabled=not st.session_state.is_assessment_complete or not st.session_state.focus_recommendations):
         if user_id and chosen_focus_area:
-            data = {"user_id": user_id, "chosen_focus_area": chosen_focus_area}
-            response = call_api("/recommend/careers", method="post", data=data)
-            if response:
-                st.subheader("Recommended Careers:")
-                for career_data in response.get("recommended_careers", []):
-                    st.markdown(f"- **{career_data['name']}**: {career_data['description']}")
-                if "soft_skills" in response:
-                    st.write("Soft Skills:", response["soft_skills"])
-            else:
-                st.error("Failed to get career recommendations.")
+            st.session_state.career_request = (user_id, chosen_focus_area, st.session_state.assessment_round)
         else:
             st.warning("Please enter your name and a Chosen Focus Area.")
+    if st.session_state.career_request:
+        # Runs off the script thread; a rerun while it is in flight resumes waiting for the same call
+        request = st.session_state.career_request
+        done, response = run_in_background(("careers",) + request, "Finding careers and soft skills...", fetch_career_recommendations, *request)
+        if done:
+            st.session_state.career_request = None
+            st.session_state.career_recommendations = response
+            if not response:
+                st.error("Failed to get career recommendations.")
+    if st.session_state.career_recommendations:
+        response = st.session_state.career_recommendations
+        st.subheader("Recommended Careers:")
+        for career_data in response.get("recommended_careers", []):
+            st.markdown(f"- **{career_data['name']}**: {career_data['description']}")
+        if "soft_skills" in response:
+            st.write("Soft Skills:", response["soft_skills"])
 
     # --- Utility Buttons for Debugging ---
     if st.sidebar.checkbox("Show Session State"):